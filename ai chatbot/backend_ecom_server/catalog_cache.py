@@ -0,0 +1,219 @@
+# backend_ecom_server/catalog_cache.py
+#
+# HTTP caching for the catalog reads (GET /products, /products/<id>, /products/batch and
+# /products/resolve). Their responses depend only on the request and the catalog, so the catalog
+# version (with the database's epoch) is their ETag: a client revalidating with If-None-Match gets
+# a 304, and a repeat of a recent request is answered from an in-memory response cache, both
+# without touching SQLite.
+#
+# The process remembers the last catalog version it read and reads it again after this process
+# commits a write, when the WAL file shows some other process wrote, or once a second regardless.
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from operator import itemgetter
+from flask import Response, g, make_response, request
+
+import database
+from compression import ENCODINGS, choose_encoding, compress, encoded_etag
+from ecom_metrics import CATALOG_RESPONSES
+
+VERSION_TTL = 1.0 # Seconds a remembered catalog version is trusted without re-reading it
+CACHE_CONTROL = "public, no-cache" # Clients may keep catalog responses, but revalidate them before each use
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+MAX_CACHED_BODY = 1024 * 1024 # Larger responses are sent but not kept
+
+def read_version(db):
+    """Returns (version, epoch) as db sees them."""
+    row = db.execute("SELECT version, epoch FROM catalog_meta WHERE id = 1").fetchone()
+    return row[0], row[1]
+
+def make_etag(version, epoch):
+    return f"{epoch}.{version}"
+
+class CatalogVersion:
+    """The catalog version as last read by this process, re-read when it may have moved."""
+
+    def __init__(self, ttl=VERSION_TTL):
+        self.ttl = ttl
+        self.version = None
+        self.epoch = None
+        self._writes = 0 # Write transactions this process has committed
+        self._read_after = -1 # self._writes when the version was last read
+        self._read_stamp = None # _wal_stamp() when the version was last read
+        self._read_at = 0.0
+        self._lock = threading.Lock()
+
+    def written(self):
+        """Called after every write commit, so the next get() reads the version again."""
+        with self._lock:
+            self._writes += 1
+
+    @staticmethod
+    def _wal_stamp():
+        # Every commit by any process appends to the WAL file, which moves its mtime or size.
+        # File mtimes are only as fine as the kernel's clock tick, hence the TTL as a backstop.
+        path = database.DATABASE + "-wal"
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return path, None
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def get(self, reread=False):
+        """
+        Returns (version, epoch), read from the database only if it may have changed since last
+        time or reread asks for it (requests that already hold a connection may as well).
+        """
+        stamp = self._wal_stamp() # Taken before the read: a write landing in between only causes another read
+        with self._lock:
+            if (not reread and self.version is not None and self._read_after == self._writes
+                    and self._read_stamp == stamp and time.monotonic() - self._read_at < self.ttl):
+                return self.version, self.epoch
+            writes = self._writes
+        version, epoch = read_version(database.get_read_db())
+        with self._lock:
+            self.version, self.epoch = version, epoch
+            self._read_after, self._read_stamp, self._read_at = writes, stamp, time.monotonic()
+        return version, epoch
+
+class ResponseCache:
+    """
+    Bodies of recent 200 responses to catalog reads, for one catalog version: a new version
+    drops them all. Least recently used bodies go first once they add up to more than max_bytes.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES, max_body=MAX_CACHED_BODY):
+        self.max_bytes = max_bytes
+        self.max_body = max_body
+        self.etag = None # Catalog version (as an ETag) the cached bodies belong to
+        self.size = 0
+        self._bodies = OrderedDict() # request key -> body, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        with self._lock:
+            if etag != self.etag:
+                return None
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key, etag, body):
+        if len(body) > self.max_body:
+            return
+        with self._lock:
+            if etag != self.etag:
+                self._bodies.clear()
+                self.size = 0
+                self.etag = etag
+            old = self._bodies.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._bodies[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, dropped = self._bodies.popitem(last=False)
+                self.size -= len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._bodies), "bytes": self.size}
+
+version_tracker = CatalogVersion()
+response_cache = ResponseCache()
+
+def request_key(view_args):
+    """The request as the cache sees it: endpoint, URL parts and query parameters, with empty ones left out."""
+    # Sorted by name only, so repeated parameters (?name=a&name=b) keep their order
+    args = sorted(((name, value) for name, value in request.args.items(multi=True) if value), key=itemgetter(0))
+    return request.endpoint, tuple(sorted(view_args.items())), tuple(args)
+
+def add_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+def revalidated_etag(etag):
+    """The tag from If-None-Match that etag (or one of its compressed forms) matches, if any."""
+    for tag in (etag,) + tuple(encoded_etag(etag, encoding) for encoding in ENCODINGS):
+        if request.if_none_match.contains_weak(tag):
+            return tag
+    return None
+
+def cached_response(key, etag, body):
+    """A response for a cached body, compressed if the client takes it, with the compressed form cached too."""
+    encoding = choose_encoding(len(body))
+    if encoding is None:
+        return add_cache_headers(Response(body, mimetype='application/json'), etag)
+    encoded = response_cache.get(key + (encoding,), etag)
+    if encoded is None:
+        encoded = compress(body, encoding)
+        response_cache.put(key + (encoding,), etag, encoded)
+    response = Response(encoded, mimetype='application/json')
+    response.headers['Content-Encoding'] = encoding
+    return add_cache_headers(response, encoded_etag(etag, encoding))
+
+def keep_body(chunks, key, etag):
+    """Passes a streamed body through, caching it once it has been sent in full."""
+    parts = []
+    size = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            yield chunk
+            if parts is not None:
+                parts.append(chunk)
+                size += len(chunk)
+                if size > response_cache.max_body:
+                    parts = None
+    finally:
+        chunks.close() # stream_with_context only releases the request (and its connection) when closed
+    if parts is not None:
+        response_cache.put(key, etag, b"".join(parts))
+
+def catalog_response(view):
+    """
+    Decorates a catalog read: answers a matching If-None-Match with 304 and repeats from the
+    response cache, and otherwise runs the view and tags its 200 responses with ETag and Cache-Control.
+    Bodies are cached uncompressed; compression.py compresses the ones that aren't served from here.
+    """
+    @functools.wraps(view)
+    def cached_view(**view_args):
+        etag = make_etag(*version_tracker.get())
+        revalidated = revalidated_etag(etag)
+        if revalidated is not None:
+            CATALOG_RESPONSES.labels('not_modified').inc()
+            return add_cache_headers(Response(status=304), revalidated)
+        key = request_key(view_args)
+        body = response_cache.get(key, etag)
+        if body is not None:
+            CATALOG_RESPONSES.labels('cached').inc()
+            return cached_response(key, etag, body)
+
+        CATALOG_RESPONSES.labels('queried').inc()
+        db = database.get_read_db()
+        db.execute("BEGIN") # The view's reads and the version they're tagged with come from one snapshot; close_db ends it
+        version, epoch = version_tracker.get(reread=True)
+        g.catalog_version = version # Already read in this snapshot; the X-Catalog-Version header reuses it
+        etag = make_etag(version, epoch)
+        response = make_response(view(**view_args))
+        if response.status_code != 200:
+            return response
+        if response.is_streamed:
+            response.response = keep_body(response.response, key, etag)
+        else:
+            response_cache.put(key, etag, response.get_data())
+        return add_cache_headers(response, etag)
+    return cached_view
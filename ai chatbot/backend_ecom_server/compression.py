@@ -0,0 +1,59 @@
+# backend_ecom_server/compression.py
+#
+# gzip/deflate for JSON responses worth compressing, when the client's Accept-Encoding allows:
+# bodies of at least MIN_SIZE bytes, and streamed catalog pages, whose size isn't known up front.
+# A compressed response gets its own ETag ("<tag>-gzip"), since a strong ETag names exact bytes.
+
+import zlib
+from flask import request
+
+MIN_SIZE = 1024 # Below this, compressing saves less than it costs both ends
+LEVEL = 6 # zlib's default trade-off between speed and size
+ENCODINGS = ('gzip', 'deflate') # In order of preference when the client weighs them equally
+WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS} # HTTP's "deflate" is the zlib format
+
+def choose_encoding(size=None):
+    """The encoding to send a body of size bytes in (None for a streamed body), or None to send it as is."""
+    if size is not None and size < MIN_SIZE:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+def compress(body, encoding):
+    compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, WBITS[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+def compress_stream(chunks, encoding):
+    compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, WBITS[encoding])
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data: # zlib holds small chunks back until it has a block's worth
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close() # Lets a streamed view release its request context and connection
+
+def encoded_etag(etag, encoding):
+    return f"{etag}-{encoding}"
+
+def compress_response(response):
+    if response.status_code != 200 or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(None if response.is_streamed else response.calculate_content_length())
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+    else:
+        response.set_data(compress(response.get_data(), encoding)) # Also sets Content-Length
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(encoded_etag(etag, encoding), weak)
+    return response
+
+def init_compression(app):
+    """Compresses the app's eligible responses on their way out."""
+    app.after_request(compress_response)
@@ -1,39 +1,186 @@
-# backend_ecom_server/database.py
-
-import sqlite3
-from flask import g # 'g' is a special object in Flask for storing data during a request
-
-DATABASE = 'ecom_data.db' # Our database file will be named ecom_data.db
-
-def get_db():
-    """Establishes a database connection or returns the existing one."""
-    if 'db' not in g: # Check if a database connection already exists for the current request
-        g.db = sqlite3.connect(DATABASE) # If not, create one
-        g.db.row_factory = sqlite3.Row # This makes rows behave like dictionaries (access columns by name)
-    return g.db # Return the connection
-
-def close_db(e=None):
-    """Closes the database connection."""
-    db = g.pop('db', None) # Get the db connection from 'g' and remove it
-
-    if db is not None:
-        db.close() # Close the connection
-
-def init_db():
-    """Initializes the database schema."""
-    db = get_db() # Get a database connection
-    with app.open_resource('schema.sql') as f: # Open schema.sql (we'll create this next)
-        db.executescript(f.read().decode('utf8')) # Execute SQL commands from the schema file
-
-def init_app(app_instance):
-    """Registers database functions with the Flask app."""
-    global app # Make Flask app instance accessible globally for init_db
-    app = app_instance
-    app.teardown_appcontext(close_db) # Ensure db connection is closed after each request
-    # No need to call init_db here directly, it will be called by mock_data.py or manually
-
-if __name__ == '__main__':
-    # This block allows you to run this file directly to initialize the db
-    # In a real app, this would be part of a proper setup script or Flask CLI command
-    # For simplicity, we'll trigger init_db from mock_data.py
+# backend_ecom_server/database.py
+
+import os
+import queue
+import sqlite3
+import time
+from urllib.request import pathname2url
+from flask import g # 'g' is a special object in Flask for storing data during a request
+
+DATABASE = 'ecom_data.db' # Our database file will be named ecom_data.db
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Connection tuning, applied once when a connection is opened
+POOL_SIZE = 16 # Idle connections kept open between requests, per pool (read-write and read-only)
+READ_ONLY_CONNECTIONS = True # query_db reads through read-only connections; False sends everything through get_db()
+STATEMENT_CACHE_SIZE = 256 # Prepared statements cached per connection, keyed by SQL text
+CACHE_SIZE_KB = 64 * 1024 # Page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024 # Read the file through mmap instead of read() calls
+BUSY_TIMEOUT_MS = 5000 # Wait this long for a lock before raising "database is locked"
+
+_pool = queue.LifoQueue(maxsize=POOL_SIZE) # LIFO so the warmest connection is reused first
+_read_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+class TimedConnection(sqlite3.Connection):
+    """
+    A connection that counts the statements it runs and the time they take, for the SQL metrics.
+    get_db() resets both when a request takes the connection. Rows fetched after execute() returns
+    are only timed where the caller adds them in (query_db does).
+    """
+    statements = 0
+    sql_seconds = 0.0
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.statements += 1
+            self.sql_seconds += time.perf_counter() - start
+
+    def executemany(self, sql, parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self.statements += 1
+            self.sql_seconds += time.perf_counter() - start
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            self.sql_seconds += time.perf_counter() - start # The fsync side of a write
+
+def connect_db(read_only=False):
+    """
+    Opens a new connection with the pragmas every request relies on. A read_only one is opened
+    with mode=ro and query_only, so nothing sent through it can write or take the write lock.
+    """
+    # Pooled connections move between request threads, but only one thread uses a connection at a time
+    if read_only:
+        db = sqlite3.connect(f"file:{pathname2url(os.path.abspath(DATABASE))}?mode=ro", uri=True,
+                             cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False, factory=TimedConnection)
+    else:
+        db = sqlite3.connect(DATABASE, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False,
+                             factory=TimedConnection)
+    db.row_factory = sqlite3.Row # This makes rows behave like dictionaries (access columns by name)
+    if read_only:
+        db.execute("PRAGMA query_only = ON")
+    else:
+        db.execute("PRAGMA journal_mode = WAL") # Readers don't block behind a writer, and vice versa
+        db.execute("PRAGMA synchronous = NORMAL") # Safe under WAL; fsyncs at checkpoints instead of every commit
+    db.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}") # PRAGMA doesn't accept bound parameters
+    db.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    db.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return db
+
+def _take(pool, read_only):
+    try:
+        db = pool.get_nowait()
+    except queue.Empty:
+        db = connect_db(read_only) # None idle, open one
+    db.statements = 0 # Count this request's SQL from zero
+    db.sql_seconds = 0.0
+    return db
+
+def get_db():
+    """Returns the read-write connection for the current request, taking a pooled one if available."""
+    if 'db' not in g: # Check if a database connection already exists for the current request
+        g.db = _take(_pool, read_only=False)
+    return g.db # Return the connection
+
+def get_read_db():
+    """
+    Returns a read-only connection for the current request. Under WAL its reads never wait on
+    a writer, and writers never wait on it. Inside a write transaction, reads go through that
+    transaction's connection instead, so they see what it has written so far.
+    """
+    if not READ_ONLY_CONNECTIONS or ('db' in g and g.db.in_transaction):
+        return get_db()
+    if 'read_db' not in g:
+        g.read_db = _take(_read_pool, read_only=True)
+    return g.read_db
+
+def request_connections():
+    """The connections the current request has taken so far."""
+    return [db for db in (g.get('db'), g.get('read_db')) if db is not None]
+
+def close_db(e=None):
+    """Returns the request's connections to their pools, or closes them if a pool is full."""
+    for name, pool in (('db', _pool), ('read_db', _read_pool)):
+        db = g.pop(name, None) # Get the connection from 'g' and remove it
+        if db is None:
+            continue
+        if db.in_transaction:
+            db.rollback() # Don't hand a half-finished transaction (or a read snapshot) to the next request
+        try:
+            pool.put_nowait(db)
+        except queue.Full:
+            db.close() # Close the connection
+
+def close_pools():
+    """Closes every idle pooled connection, e.g. before forking workers, which must each open their own."""
+    for pool in (_pool, _read_pool):
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+def init_db():
+    """Initializes the database schema."""
+    db = get_db() # Get a database connection
+    with app.open_resource('schema.sql') as f: # Open schema.sql (we'll create this next)
+        db.executescript(f.read().decode('utf8')) # Execute SQL commands from the schema file
+
+def migrate_db(db):
+    """Applies any migrations/NNN_*.sql newer than the database's user_version."""
+    current_version = db.execute("PRAGMA user_version").fetchone()[0]
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith('.sql'):
+            continue
+        version = int(filename.split('_', 1)[0])
+        if version <= current_version:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), 'r') as f:
+            db.executescript(f.read())
+        db.execute(f"PRAGMA user_version = {version}") # PRAGMA doesn't accept bound parameters
+        db.commit()
+        current_version = version
+    return current_version
+
+def recount_facets(db):
+    """Recounts product_facets from scratch, for a load that ran without its triggers (migration 007)."""
+    db.execute("DELETE FROM product_facets")
+    db.execute("""
+        INSERT INTO product_facets (facet, value, count)
+        SELECT 'category', category, count(*) FROM products GROUP BY category
+        UNION ALL
+        SELECT 'brand', brand, count(*) FROM products WHERE brand IS NOT NULL GROUP BY brand
+        UNION ALL
+        SELECT 'price', (SELECT max(min_price) FROM price_buckets WHERE min_price <= price) AS bucket, count(*)
+        FROM products WHERE bucket IS NOT NULL GROUP BY bucket
+    """)
+
+def init_app(app_instance):
+    """Registers database functions with the Flask app."""
+    global app # Make Flask app instance accessible globally for init_db
+    app = app_instance
+    app.teardown_appcontext(close_db) # Ensure db connection is released after each request
+    # Bring an existing database file up to date with the current schema
+    if os.path.exists(DATABASE):
+        db = sqlite3.connect(DATABASE)
+        try:
+            migrate_db(db)
+            db.execute("PRAGMA journal_mode = WAL") # Persistent, and read-only connections can't switch to it themselves
+        finally:
+            db.close()
+    # No need to call init_db here directly, it will be called by mock_data.py or manually
+
+if __name__ == '__main__':
+    # This block allows you to run this file directly to initialize the db
+    # In a real app, this would be part of a proper setup script or Flask CLI command
+    # For simplicity, we'll trigger init_db from mock_data.py
     print("Database functions defined. Run mock_data.py to initialize and populate.")
\ No newline at end of file
@@ -0,0 +1,115 @@
+# backend_ecom_server/ecom_metrics.py
+#
+# Prometheus metrics for the e-commerce server: latency per route, and how many SQL statements
+# each request ran and how long it spent in SQLite (counted by database.TimedConnection).
+# Recording costs a few microseconds per request; the text format is only built when /metrics is scraped.
+# The writer thread's group commits (write_queue.py) report their batch sizes and queueing time,
+# and the SQL each queued cart or stock change cost counts towards the request that queued it.
+# Calls carrying the gateway's X-Trace-ID get it echoed back, with a Server-Timing header saying
+# how much of the server's time went to SQL. ecom_startup_seconds says how long create_app() took.
+
+import time
+from flask import Response, g, request
+
+from database import request_connections
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import GC_COLLECTOR, PLATFORM_COLLECTOR, PROCESS_COLLECTOR
+
+registry = CollectorRegistry() # Separate from the gateway's when both run in one process (benchmarks)
+for collector in (PROCESS_COLLECTOR, PLATFORM_COLLECTOR, GC_COLLECTOR):
+    registry.register(collector)
+
+REQUEST_SECONDS = Histogram(
+    'ecom_request_duration_seconds', "Time to handle a request, including streaming its body.",
+    ['method', 'route', 'status'], registry=registry,
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+SQL_STATEMENTS = Histogram(
+    'ecom_request_sql_statements', "SQL statements run per request.", ['route'], registry=registry,
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50, 100),
+)
+SQL_SECONDS = Histogram(
+    'ecom_request_sql_duration_seconds', "Time per request spent running SQL statements.", ['route'], registry=registry,
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+CATALOG_RESPONSES = Counter(
+    'ecom_catalog_responses', "Catalog reads by how they were answered: not_modified (304), cached or queried.",
+    ['result'], registry=registry,
+)
+WRITE_BATCH_SIZE = Histogram(
+    'ecom_write_batch_size', "Cart and stock operations per group commit.", registry=registry,
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+WRITE_WAIT_SECONDS = Histogram(
+    'ecom_write_wait_seconds', "Time from queueing a cart or stock operation to its commit.", registry=registry,
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+STARTUP_SECONDS = Gauge(
+    'ecom_startup_seconds', "Time the app took to start, by phase: import, setup and warm_up.", ['phase'],
+    registry=registry,
+)
+
+def add_queued_sql(statements, sql_seconds):
+    """Counts SQL the writer thread ran for the current request (see app.run_write) towards its totals."""
+    queued_statements, queued_seconds = g.get('queued_sql', (0, 0.0))
+    g.queued_sql = (queued_statements + statements, queued_seconds + sql_seconds)
+
+def sql_totals():
+    """
+    Statements and SQL seconds for the current request: over its connections (read-only and
+    read-write) and its queued writes. None if it never touched the database.
+    """
+    connections = request_connections()
+    queued = g.get('queued_sql')
+    if not connections and queued is None:
+        return None
+    statements, sql_seconds = queued or (0, 0.0)
+    return (statements + sum(db.statements for db in connections),
+            sql_seconds + sum(db.sql_seconds for db in connections))
+
+def start_timer():
+    g.request_start = time.perf_counter()
+
+def finish_response(response):
+    g.status = response.status_code
+    trace_id = request.headers.get('X-Trace-ID')
+    if trace_id:
+        # Up to the response headers; a streamed body's remaining rows come after
+        response.headers['X-Trace-ID'] = trace_id
+        timings = [f"app;dur={(time.perf_counter() - g.request_start) * 1000:.3f}"]
+        totals = sql_totals()
+        if totals:
+            statements, sql_seconds = totals
+            timings.append(f'sql;dur={sql_seconds * 1000:.3f};desc="{statements} statements"')
+        response.headers['Server-Timing'] = ", ".join(timings)
+    return response
+
+def record_request(exc=None):
+    """Runs at teardown, so streamed responses are timed to their last row."""
+    start = g.pop('request_start', None)
+    if start is None:
+        return
+    route = request.url_rule.rule if request.url_rule else "unmatched" # Rule templates, not raw paths, keep labels bounded
+    status = 500 if exc is not None else g.pop('status', 500)
+    REQUEST_SECONDS.labels(request.method, route, str(status)).observe(time.perf_counter() - start)
+    totals = sql_totals()
+    if totals: # Requests that never touched the database don't count towards the SQL histograms
+        statements, sql_seconds = totals
+        SQL_STATEMENTS.labels(route).observe(statements)
+        SQL_SECONDS.labels(route).observe(sql_seconds)
+
+def record_startup(phases):
+    """Keeps how long each startup phase took for /metrics, and prints it."""
+    for phase, seconds in phases.items():
+        STARTUP_SECONDS.labels(phase).set(seconds)
+    print("E-commerce app started in " + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in phases.items()))
+
+def metrics():
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+def init_metrics(app):
+    """Registers the timing hooks and the /metrics route on the app."""
+    app.before_request(start_timer)
+    app.after_request(finish_response) # Registered before app.py's hooks, so it runs after them
+    app.teardown_request(record_request) # Before database.close_db, which runs at app context teardown
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
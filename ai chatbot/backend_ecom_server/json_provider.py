@@ -0,0 +1,33 @@
+# backend_ecom_server/json_provider.py
+#
+# Flask's JSON handling (jsonify, request.get_json) backed by orjson, which serializes product
+# payloads several times faster than the standard library. Output is compact UTF-8, and keys keep
+# the order they were selected in instead of being sorted.
+
+import decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+
+def default(obj):
+    """Types orjson doesn't serialize natively but Flask's default provider did."""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj):
+    return orjson.dumps(obj, default=default)
+
+class OrjsonProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Straight to bytes, skipping the str round trip dumps() would make
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype="application/json")
@@ -0,0 +1,34 @@
+-- backend_ecom_server/migrations/001_products_fts.sql
+-- Full-text index over the product catalog, used by GET /products?q=...
+
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name,
+    description,
+    brand,
+    category,
+    content='products',
+    content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+-- Keep the index in sync with the products table. Stock-only updates (every
+-- cart add/remove) don't touch indexed columns, so they don't fire a reindex.
+CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, description, brand, category)
+    VALUES (new.rowid, new.name, new.description, new.brand, new.category);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, brand, category)
+    VALUES ('delete', old.rowid, old.name, old.description, old.brand, old.category);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description, brand, category ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, brand, category)
+    VALUES ('delete', old.rowid, old.name, old.description, old.brand, old.category);
+    INSERT INTO products_fts (rowid, name, description, brand, category)
+    VALUES (new.rowid, new.name, new.description, new.brand, new.category);
+END;
+
+-- Index whatever is already in the catalog
+INSERT INTO products_fts (products_fts) VALUES ('rebuild');
@@ -0,0 +1,17 @@
+-- backend_ecom_server/migrations/002_cart_items_unique.sql
+-- One cart line per (cart, product), so /cart/add can upsert with ON CONFLICT.
+
+-- Fold any duplicate lines left behind by concurrent adds into the oldest one
+UPDATE cart_items
+SET quantity = (
+    SELECT SUM(d.quantity) FROM cart_items d
+    WHERE d.cart_id = cart_items.cart_id AND d.product_id = cart_items.product_id
+)
+WHERE rowid IN (
+    SELECT MIN(rowid) FROM cart_items GROUP BY cart_id, product_id HAVING COUNT(*) > 1
+);
+
+DELETE FROM cart_items
+WHERE rowid NOT IN (SELECT MIN(rowid) FROM cart_items GROUP BY cart_id, product_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cart_items_cart_product ON cart_items (cart_id, product_id);
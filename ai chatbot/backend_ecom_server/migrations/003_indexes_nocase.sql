@@ -0,0 +1,54 @@
+-- backend_ecom_server/migrations/003_indexes_nocase.sql
+-- Indexes for every hot lookup, and case-insensitive category/brand so get_products
+-- can compare them directly (an index can't be used through LOWER()).
+
+BEGIN;
+
+-- SQLite can't change a column's collation in place, so rebuild products.
+-- rowids are copied as-is, which keeps products_fts pointing at the right rows.
+CREATE TABLE products_new (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    category TEXT NOT NULL COLLATE NOCASE,
+    brand TEXT COLLATE NOCASE,
+    stock INTEGER NOT NULL,
+    image_url TEXT
+);
+INSERT INTO products_new (rowid, id, name, description, price, category, brand, stock, image_url)
+SELECT rowid, id, name, description, price, category, brand, stock, image_url FROM products;
+DROP TABLE products; -- Also drops the products_fts_* triggers
+ALTER TABLE products_new RENAME TO products;
+
+CREATE TRIGGER products_fts_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, description, brand, category)
+    VALUES (new.rowid, new.name, new.description, new.brand, new.category);
+END;
+
+CREATE TRIGGER products_fts_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, brand, category)
+    VALUES ('delete', old.rowid, old.name, old.description, old.brand, old.category);
+END;
+
+CREATE TRIGGER products_fts_au AFTER UPDATE OF name, description, brand, category ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, brand, category)
+    VALUES ('delete', old.rowid, old.name, old.description, old.brand, old.category);
+    INSERT INTO products_fts (rowid, name, description, brand, category)
+    VALUES (new.rowid, new.name, new.description, new.brand, new.category);
+END;
+
+-- Catalog filters: category/brand equality (case-insensitive via the column collation) plus a price range
+CREATE INDEX idx_products_category_price ON products (category, price);
+CREATE INDEX idx_products_brand_price ON products (brand, price);
+CREATE INDEX idx_products_price ON products (price);
+
+-- Cart lookup by user; includes id so the lookup never touches the table
+CREATE INDEX IF NOT EXISTS idx_carts_user ON carts (user_id, id);
+
+-- cart_items (cart_id, product_id) is covered by idx_cart_items_cart_product from migration 002
+
+CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id);
+CREATE INDEX IF NOT EXISTS idx_chat_logs_session ON chat_logs (session_id, timestamp);
+
+COMMIT;
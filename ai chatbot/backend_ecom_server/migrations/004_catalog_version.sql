@@ -0,0 +1,21 @@
+-- backend_ecom_server/migrations/004_catalog_version.sql
+-- A single catalog version number, bumped on every product or stock change.
+-- Clients (the chatbot gateway's product cache) compare it to know when their copy is stale.
+
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1), -- Always exactly one row
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_ai AFTER INSERT ON products BEGIN
+    UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_au AFTER UPDATE ON products BEGIN
+    UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_version_ad AFTER DELETE ON products BEGIN
+    UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+END;
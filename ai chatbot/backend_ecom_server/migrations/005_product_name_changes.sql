@@ -0,0 +1,23 @@
+-- backend_ecom_server/migrations/005_product_name_changes.sql
+-- A log of products whose name appeared, changed or went away, so clients that keep their own
+-- copy of the product names (the chatbot gateway's name index) can catch up through
+-- GET /catalog/names?since=<seq> instead of downloading every name again.
+-- Stock and price updates don't touch it.
+
+CREATE TABLE IF NOT EXISTS product_name_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, -- Never reused, so a client's position stays meaningful
+    product_id TEXT NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS product_name_changes_ai AFTER INSERT ON products BEGIN
+    INSERT INTO product_name_changes (product_id) VALUES (new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS product_name_changes_au AFTER UPDATE OF id, name ON products BEGIN
+    INSERT INTO product_name_changes (product_id) SELECT old.id WHERE old.id != new.id;
+    INSERT INTO product_name_changes (product_id) VALUES (new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS product_name_changes_ad AFTER DELETE ON products BEGIN
+    INSERT INTO product_name_changes (product_id) VALUES (old.id);
+END;
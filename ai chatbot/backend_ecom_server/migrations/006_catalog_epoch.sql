@@ -0,0 +1,6 @@
+-- backend_ecom_server/migrations/006_catalog_epoch.sql
+-- A random id for this database's catalog. The catalog version starts again at 0 whenever the
+-- database is recreated, so ETags (see catalog_cache.py) pair it with the epoch to never repeat.
+
+ALTER TABLE catalog_meta ADD COLUMN epoch TEXT NOT NULL DEFAULT '';
+UPDATE catalog_meta SET epoch = lower(hex(randomblob(8)));
@@ -0,0 +1,58 @@
+-- backend_ecom_server/migrations/007_product_facets.sql
+-- Product counts per category, per brand and per price range, for GET /products/facets.
+-- Triggers keep them current as products come and go or change category, brand or price,
+-- so reading them never groups the whole catalog. Stock updates don't touch them.
+
+CREATE TABLE IF NOT EXISTS price_buckets (
+    min_price INTEGER PRIMARY KEY -- A bucket runs up to the next one's min_price; the last is open-ended
+);
+INSERT OR IGNORE INTO price_buckets (min_price) VALUES (0), (25), (50), (100), (250), (500), (1000);
+
+CREATE TABLE IF NOT EXISTS product_facets (
+    facet TEXT NOT NULL, -- 'category', 'brand' or 'price'
+    value NOT NULL COLLATE NOCASE, -- The category or brand as first seen, or the price bucket's min_price
+    count INTEGER NOT NULL, -- Left at 0 when the last product goes; GET /products/facets skips those
+    PRIMARY KEY (facet, value)
+) WITHOUT ROWID;
+
+INSERT OR REPLACE INTO product_facets (facet, value, count)
+SELECT 'category', category, count(*) FROM products GROUP BY category
+UNION ALL
+SELECT 'brand', brand, count(*) FROM products WHERE brand IS NOT NULL GROUP BY brand
+UNION ALL
+SELECT 'price', (SELECT max(min_price) FROM price_buckets WHERE min_price <= price) AS bucket, count(*)
+FROM products WHERE bucket IS NOT NULL GROUP BY bucket;
+
+-- Each trigger adds up its changes per facet value first, so an update that keeps a value is a no-op
+CREATE TRIGGER IF NOT EXISTS product_facets_ai AFTER INSERT ON products BEGIN
+    INSERT INTO product_facets (facet, value, count)
+    SELECT facet, value, sum(delta) FROM (
+        SELECT 'category' AS facet, new.category AS value, 1 AS delta
+        UNION ALL SELECT 'brand', new.brand, 1
+        UNION ALL SELECT 'price', (SELECT max(min_price) FROM price_buckets WHERE min_price <= new.price), 1
+    ) WHERE value IS NOT NULL GROUP BY facet, value
+    ON CONFLICT (facet, value) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS product_facets_au AFTER UPDATE OF category, brand, price ON products BEGIN
+    INSERT INTO product_facets (facet, value, count)
+    SELECT facet, value, sum(delta) FROM (
+        SELECT 'category' AS facet, old.category AS value, -1 AS delta
+        UNION ALL SELECT 'brand', old.brand, -1
+        UNION ALL SELECT 'price', (SELECT max(min_price) FROM price_buckets WHERE min_price <= old.price), -1
+        UNION ALL SELECT 'category', new.category, 1
+        UNION ALL SELECT 'brand', new.brand, 1
+        UNION ALL SELECT 'price', (SELECT max(min_price) FROM price_buckets WHERE min_price <= new.price), 1
+    ) WHERE value IS NOT NULL GROUP BY facet, value
+    ON CONFLICT (facet, value) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS product_facets_ad AFTER DELETE ON products BEGIN
+    INSERT INTO product_facets (facet, value, count)
+    SELECT facet, value, sum(delta) FROM (
+        SELECT 'category' AS facet, old.category AS value, -1 AS delta
+        UNION ALL SELECT 'brand', old.brand, -1
+        UNION ALL SELECT 'price', (SELECT max(min_price) FROM price_buckets WHERE min_price <= old.price), -1
+    ) WHERE value IS NOT NULL GROUP BY facet, value
+    ON CONFLICT (facet, value) DO UPDATE SET count = count + excluded.count;
+END;
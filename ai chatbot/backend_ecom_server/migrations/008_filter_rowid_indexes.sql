@@ -0,0 +1,7 @@
+-- backend_ecom_server/migrations/008_filter_rowid_indexes.sql
+-- GET /products pages through a category or brand in rowid order (keyset on rowid). The
+-- (category, price) and (brand, price) indexes hand rows back in price order, so every page
+-- sorted the whole category first. These end in the rowid, so a page is a range read again.
+
+CREATE INDEX IF NOT EXISTS idx_products_category ON products (category);
+CREATE INDEX IF NOT EXISTS idx_products_brand ON products (brand);
@@ -1,82 +1,226 @@
-# backend_ecom_server/mock_data.py
-
-import sqlite3
-import uuid
-import pandas as pd
-from faker import Faker # For generating fake data
-from database import DATABASE, init_db # Import from our database setup
-
-# Temporarily create a mock Flask app context for init_db to work
-class MockApp:
-    def open_resource(self, path):
-        # Simulate app.open_resource to read schema.sql
-        return open(path, 'rb')
-    def teardown_appcontext(self, func):
-        pass # Do nothing for mock app
-
-mock_app_instance = MockApp()
-# Initialize database schema first
-conn = sqlite3.connect(DATABASE)
-with open('schema.sql', 'r') as f:
-    conn.executescript(f.read())
-conn.close()
-
-
-fake = Faker()
-
-def generate_mock_products(num_products=100):
-    """Generates mock product data."""
-    products = []
-    categories = ['Electronics', 'Home & Kitchen', 'Books', 'Clothing', 'Sports', 'Beauty']
-    brands = ['TechGen', 'HomeLux', 'PageTurner', 'FashionFlow', 'FitLife', 'GlowUp']
-
-    for _ in range(num_products):
-        product_id = str(uuid.uuid4())
-        name = fake.word().capitalize() + " " + fake.word().capitalize() + " " + fake.random_element(['Pro', 'Max', 'Lite', 'Edition', 'Basic'])
-        description = fake.sentence(nb_words=10)
-        price = round(fake.random_element([19.99, 49.99, 99.99, 149.99, 199.99, 299.99, 499.99, 799.99]), 2)
-        category = fake.random_element(categories)
-        brand = fake.random_element(brands)
-        stock = fake.random_int(min=0, max=200) # Some products can be out of stock
-        image_url = f"https://via.placeholder.com/150?text={name.replace(' ', '+')}" # Placeholder image
-
-        products.append((product_id, name, description, price, category, brand, stock, image_url))
-    return products
-
-def populate_db():
-    """Populates the database with mock products and a user."""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-
-    # Clear existing data
-    cursor.execute("DELETE FROM products")
-    cursor.execute("DELETE FROM users")
-    cursor.execute("DELETE FROM carts")
-    cursor.execute("DELETE FROM cart_items")
-    cursor.execute("DELETE FROM orders")
-    cursor.execute("DELETE FROM order_items")
-    cursor.execute("DELETE FROM chat_logs") # Clear chat logs too
-
-    # Insert products
-    products_data = generate_mock_products()
-    cursor.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?)", products_data)
-    print(f"Inserted {len(products_data)} mock products.")
-
-    # Insert a mock user
-    user_id = "test_user_123"
-    username = "testuser"
-    password = "password" # In a real app, hash this password!
-    cursor.execute("INSERT INTO users VALUES (?, ?, ?)", (user_id, username, password))
-    print(f"Inserted mock user: {username}")
-
-    # Create an empty cart for the mock user
-    cart_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO carts VALUES (?, ?)", (cart_id, user_id))
-    print(f"Created empty cart for {username}")
-
-    conn.commit()
-    conn.close()
-    print("Database populated successfully!")
-
-if __name__ == '__main__':
-    populate_db()
\ No newline at end of file
+# backend_ecom_server/mock_data.py
+#
+# Builds the demo database: a catalog of any size plus users, carts, orders and chat logs.
+# Everything is derived from --seed, so the same seed and sizes always give the same rows.
+# Rows are streamed into executemany() a chunk at a time, so memory stays flat at any size.
+#
+#   python mock_data.py [--products 100] [--users 10] [--orders 20] [--chat-logs 100]
+#                       [--seed 42] [--chunk-size 50000] [--database ecom_data.db]
+
+import argparse
+import datetime
+import hashlib
+import itertools
+import os
+import random
+import sqlite3
+import struct
+import time
+from contextlib import contextmanager
+import database # Import from our database setup
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+TEST_USER = ("test_user_123", "testuser", "password") # The demo login; its cart starts empty. In a real app, hash this password!
+BASE_TIME = datetime.datetime(2024, 1, 1) # Generated orders and chats fall in the year before this
+
+# Product vocabulary. Kept here rather than taken from Faker so the output never changes with a library upgrade.
+CATALOG = {
+    'Electronics': ['Laptop', 'Headphones', 'Speaker', 'Monitor', 'Keyboard', 'Mouse', 'Charger', 'Camera',
+                    'Tablet', 'Smartwatch', 'Router', 'Earbuds'],
+    'Home & Kitchen': ['Blender', 'Kettle', 'Toaster', 'Lamp', 'Frying Pan', 'Knife Set', 'Mug', 'Vacuum',
+                       'Air Fryer', 'Coffee Maker', 'Pillow', 'Rug'],
+    'Books': ['Novel', 'Cookbook', 'Travel Guide', 'Biography', 'Notebook', 'Atlas', 'Thriller', 'Poetry Collection',
+              'Comic', 'Workbook'],
+    'Clothing': ['Jacket', 'T-Shirt', 'Jeans', 'Sneakers', 'Hoodie', 'Dress', 'Scarf', 'Sweater', 'Boots', 'Cap'],
+    'Sports': ['Yoga Mat', 'Dumbbell', 'Football', 'Tennis Racket', 'Bike Helmet', 'Water Bottle', 'Running Shoes',
+               'Jump Rope', 'Backpack', 'Tent'],
+    'Beauty': ['Serum', 'Moisturizer', 'Lipstick', 'Shampoo', 'Perfume', 'Face Mask', 'Sunscreen', 'Hair Dryer',
+               'Nail Polish', 'Body Lotion'],
+}
+CATEGORIES = list(CATALOG)
+BRANDS = ['TechGen', 'HomeLux', 'PageTurner', 'FashionFlow', 'FitLife', 'GlowUp']
+ADJECTIVES = ['Swift', 'Classic', 'Ultra', 'Smart', 'Compact', 'Urban', 'Eco', 'Bold', 'Silent', 'Bright',
+              'Nova', 'Prime', 'Zen', 'Rapid', 'Cozy', 'Vivid', 'Sleek', 'Rugged', 'Pure', 'Aero']
+SUFFIXES = ['Pro', 'Max', 'Lite', 'Edition', 'Basic']
+PRICES = [19.99, 49.99, 99.99, 149.99, 199.99, 299.99, 499.99, 799.99]
+WORDS = ['durable', 'lightweight', 'everyday', 'premium', 'design', 'quality', 'comfortable', 'reliable', 'modern',
+         'perfect', 'for', 'with', 'and', 'the', 'home', 'travel', 'work', 'gift', 'soft', 'fast', 'easy', 'use',
+         'clean', 'long', 'lasting', 'battery', 'material', 'style', 'finish', 'compact', 'size', 'great', 'value',
+         'classic', 'look', 'feel', 'made', 'to', 'last', 'all', 'day', 'simple', 'setup', 'care', 'fresh', 'new']
+STATUSES = ['pending', 'completed', 'shipped']
+
+def _digest_uuid(digest):
+    """Formats 16 bytes of a hash as a version 4 UUID string (cheaper than building uuid.UUID)."""
+    x = digest[:16].hex()
+    return f"{x[:8]}-{x[8:12]}-4{x[13:16]}-{'89ab'[int(x[16], 16) & 3]}{x[17:20]}-{x[20:32]}"
+
+def product_row(seed, index):
+    """
+    Row number index of the catalog for seed. Each row comes from its own hash, so any product can
+    be rebuilt without the others (orders and carts use this to refer to products without a lookup).
+    """
+    digest = hashlib.blake2b(b"product:%d:%d" % (seed, index), digest_size=64).digest()
+    picks = struct.unpack_from('<24H', digest, 16)
+    category = CATEGORIES[picks[0] % len(CATEGORIES)]
+    nouns = CATALOG[category]
+    name = f"{ADJECTIVES[picks[1] % len(ADJECTIVES)]} {nouns[picks[2] % len(nouns)]} {SUFFIXES[picks[3] % len(SUFFIXES)]}"
+    description = " ".join(WORDS[pick % len(WORDS)] for pick in picks[4:14]).capitalize() + "."
+    price = PRICES[picks[14] % len(PRICES)]
+    brand = BRANDS[picks[15] % len(BRANDS)]
+    stock = picks[16] % 201 # Some products can be out of stock
+    image_url = f"https://via.placeholder.com/150?text={name.replace(' ', '+')}" # Placeholder image
+    return (_digest_uuid(digest), name, description, price, category, brand, stock, image_url)
+
+def user_id(seed, index):
+    return _digest_uuid(hashlib.blake2b(b"user:%d:%d" % (seed, index), digest_size=16).digest())
+
+def generate_products(seed, num_products):
+    return (product_row(seed, index) for index in range(num_products))
+
+def generate_users(seed, num_users):
+    yield TEST_USER
+    for index in range(num_users):
+        yield (user_id(seed, index), f"user{index}", "password")
+
+def generate_carts(seed, num_users):
+    """One cart per user; the test user's is the first."""
+    yield (_digest_uuid(hashlib.blake2b(b"cart:%d:test" % seed, digest_size=16).digest()), TEST_USER[0])
+    for index in range(num_users):
+        yield (_digest_uuid(hashlib.blake2b(b"cart:%d:%d" % (seed, index), digest_size=16).digest()), user_id(seed, index))
+
+def generate_cart_items(seed, num_products, num_users):
+    """Zero to three distinct products in each generated user's cart (never the test user's)."""
+    rng = random.Random(f"{seed}:cart_items")
+    carts = itertools.islice(generate_carts(seed, num_users), 1, None)
+    for cart_id, _ in carts:
+        for product_index in rng.sample(range(num_products), min(rng.randint(0, 3), num_products)):
+            line_id = _digest_uuid(hashlib.blake2b(b"line:%s:%d" % (cart_id.encode(), product_index), digest_size=16).digest())
+            yield (line_id, cart_id, product_row(seed, product_index)[0], rng.randint(1, 3))
+
+def generate_orders(seed, num_products, num_users, num_orders):
+    """Yields (order row, [order item rows]) pairs; items use the product's price as the purchase price."""
+    rng = random.Random(f"{seed}:orders")
+    for index in range(num_orders):
+        order_id = _digest_uuid(hashlib.blake2b(b"order:%d:%d" % (seed, index), digest_size=16).digest())
+        buyer = user_id(seed, rng.randrange(num_users)) if num_users else TEST_USER[0]
+        items = []
+        for line, product_index in enumerate(rng.sample(range(num_products), min(rng.randint(1, 4), num_products))):
+            product = product_row(seed, product_index)
+            items.append((f"{order_id}-{line}", order_id, product[0], rng.randint(1, 3), product[3]))
+        total = round(sum(quantity * price for _, _, _, quantity, price in items), 2)
+        order_date = (BASE_TIME - datetime.timedelta(seconds=rng.randrange(365 * 86400))).isoformat()
+        yield (order_id, buyer, order_date, total, rng.choice(STATUSES)), items
+
+def generate_chat_logs(seed, num_logs):
+    """Conversations of ten alternating user/chatbot messages, one second apart."""
+    rng = random.Random(f"{seed}:chat_logs")
+    start = BASE_TIME - datetime.timedelta(days=30)
+    for index in range(num_logs):
+        session_id = _digest_uuid(hashlib.blake2b(b"session:%d:%d" % (seed, index // 10), digest_size=16).digest())
+        sender = "user" if index % 2 == 0 else "chatbot"
+        message = " ".join(rng.choices(WORDS, k=rng.randint(3, 12))).capitalize()
+        timestamp = (start + datetime.timedelta(seconds=index)).isoformat()
+        yield (f"{session_id}-{index % 10}", session_id, sender, message, timestamp)
+
+def insert_chunks(conn, sql, rows, chunk_size):
+    """executemany() over rows, chunk_size rows (and one transaction) at a time. Returns the row count."""
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return count
+        with conn:
+            conn.executemany(sql, chunk)
+        count += len(chunk)
+
+@contextmanager
+def bulk_load(conn):
+    """
+    For loading a fresh database: switches to fast, unsafe-if-interrupted pragmas and drops every
+    index and trigger (catalog FTS sync, catalog version bumps, facet counts), then recreates them
+    after the load and builds the FTS index and facet counts in one pass each, which is far cheaper
+    than maintaining them row by row.
+    """
+    conn.execute("PRAGMA journal_mode = OFF") # A crash mid-load means rebuilding, which is fine for generated data
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144") # 256 MiB of page cache, mostly for the index builds
+    conn.execute("PRAGMA temp_store = MEMORY")
+    deferred = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL"
+    ).fetchall()
+    for kind, name, _ in deferred:
+        conn.execute(f'DROP {kind.upper()} "{name}"')
+    conn.commit()
+
+    yield conn
+
+    for _, _, sql in deferred:
+        conn.execute(sql)
+    # Nothing the load wrote went through the catalog version or name change log, so this is a new
+    # catalog as far as clients' ETags and name index positions are concerned
+    conn.execute("UPDATE catalog_meta SET epoch = lower(hex(randomblob(8)))")
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('optimize')") # Merge into one segment
+    conn.commit()
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("PRAGMA optimize") # Gather planner statistics for the new indexes
+    database.recount_facets(conn) # After PRAGMA optimize, which would take its GROUP BYs as a reason to ANALYZE products
+    conn.commit()
+    conn.execute("PRAGMA journal_mode = WAL") # What the app runs with
+
+def populate_db(database_path=database.DATABASE, num_products=100, num_users=10, num_orders=20, num_chat_logs=100,
+                seed=42, chunk_size=50_000):
+    """Recreates the database at database_path and fills it with generated data."""
+    for suffix in ("", "-wal", "-shm"): # Starting from an empty file is faster than dropping big tables
+        if os.path.exists(database_path + suffix):
+            os.remove(database_path + suffix)
+    conn = sqlite3.connect(database_path)
+    with open(SCHEMA_PATH, 'r') as f:
+        conn.executescript(f.read())
+    database.migrate_db(conn) # Apply migrations/ on top of the baseline schema
+
+    start = time.perf_counter()
+    with bulk_load(conn):
+        def load(table, placeholders, rows):
+            table_start = time.perf_counter()
+            count = insert_chunks(conn, f"INSERT INTO {table} VALUES ({placeholders})", rows, chunk_size)
+            print(f"Inserted {count} {table} in {time.perf_counter() - table_start:.1f}s.")
+
+        load("products", "?, ?, ?, ?, ?, ?, ?, ?", generate_products(seed, num_products))
+        load("users", "?, ?, ?", generate_users(seed, num_users))
+        load("carts", "?, ?", generate_carts(seed, num_users))
+        if num_products:
+            load("cart_items", "?, ?, ?, ?", generate_cart_items(seed, num_products, num_users))
+            orders = generate_orders(seed, num_products, num_users, num_orders)
+            order_items = [] # Filled while orders stream past, then flushed a chunk at a time
+            item_count = 0
+            def order_rows():
+                nonlocal item_count
+                for order, items in orders:
+                    order_items.extend(items)
+                    if len(order_items) >= chunk_size:
+                        item_count += insert_chunks(conn, "INSERT INTO order_items VALUES (?, ?, ?, ?, ?)", order_items, chunk_size)
+                        order_items.clear()
+                    yield order
+            load("orders", "?, ?, ?, ?, ?", order_rows())
+            item_count += insert_chunks(conn, "INSERT INTO order_items VALUES (?, ?, ?, ?, ?)", order_items, chunk_size)
+            print(f"Inserted {item_count} order_items along with them.")
+        load("chat_logs", "?, ?, ?, ?, ?", generate_chat_logs(seed, num_chat_logs))
+        index_start = time.perf_counter()
+    print(f"Built indexes and full-text search in {time.perf_counter() - index_start:.1f}s.")
+    conn.close()
+    print(f"Database {database_path} populated in {time.perf_counter() - start:.1f}s "
+          f"(test login: {TEST_USER[1]} / {TEST_USER[2]}).")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create the e-commerce database and fill it with generated data.")
+    parser.add_argument('--products', type=int, default=100, help="catalog size")
+    parser.add_argument('--users', type=int, default=10, help="users besides the test user, each with a cart")
+    parser.add_argument('--orders', type=int, default=20, help="past orders, one to four items each")
+    parser.add_argument('--chat-logs', type=int, default=100, help="chat log rows")
+    parser.add_argument('--seed', type=int, default=42, help="same seed and sizes give the same data")
+    parser.add_argument('--chunk-size', type=int, default=50_000, help="rows per executemany and transaction")
+    parser.add_argument('--database', default=database.DATABASE, help="database file to (re)create")
+    args = parser.parse_args()
+    populate_db(args.database, args.products, args.users, args.orders, args.chat_logs, args.seed, args.chunk_size)
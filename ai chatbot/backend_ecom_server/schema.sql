@@ -1,68 +1,72 @@
--- backend_ecom_server/schema.sql
-
-DROP TABLE IF EXISTS products;
-DROP TABLE IF EXISTS users;
-DROP TABLE IF EXISTS carts;
-DROP TABLE IF EXISTS cart_items;
-DROP TABLE IF EXISTS orders;
-DROP TABLE IF EXISTS order_items;
-DROP TABLE IF EXISTS chat_logs; -- Table to store chat interactions
-
-CREATE TABLE products (
-    id TEXT PRIMARY KEY,
-    name TEXT NOT NULL,
-    description TEXT,
-    price REAL NOT NULL,
-    category TEXT NOT NULL,
-    brand TEXT,
-    stock INTEGER NOT NULL,
-    image_url TEXT
-);
-
-CREATE TABLE users (
-    id TEXT PRIMARY KEY,
-    username TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL -- In a real app, store hashed passwords!
-);
-
-CREATE TABLE carts (
-    id TEXT PRIMARY KEY,
-    user_id TEXT NOT NULL,
-    FOREIGN KEY (user_id) REFERENCES users (id)
-);
-
-CREATE TABLE cart_items (
-    id TEXT PRIMARY KEY,
-    cart_id TEXT NOT NULL,
-    product_id TEXT NOT NULL,
-    quantity INTEGER NOT NULL,
-    FOREIGN KEY (cart_id) REFERENCES carts (id),
-    FOREIGN KEY (product_id) REFERENCES products (id)
-);
-
-CREATE TABLE orders (
-    id TEXT PRIMARY KEY,
-    user_id TEXT NOT NULL,
-    order_date TEXT NOT NULL,
-    total_amount REAL NOT NULL,
-    status TEXT NOT NULL, -- e.g., 'pending', 'completed', 'shipped'
-    FOREIGN KEY (user_id) REFERENCES users (id)
-);
-
-CREATE TABLE order_items (
-    id TEXT PRIMARY KEY,
-    order_id TEXT NOT NULL,
-    product_id TEXT NOT NULL,
-    quantity INTEGER NOT NULL,
-    price_at_purchase REAL NOT NULL,
-    FOREIGN KEY (order_id) REFERENCES orders (id),
-    FOREIGN KEY (product_id) REFERENCES products (id)
-);
-
-CREATE TABLE chat_logs (
-    id TEXT PRIMARY KEY,
-    session_id TEXT NOT NULL,
-    sender TEXT NOT NULL, -- 'user' or 'chatbot'
-    message TEXT NOT NULL,
-    timestamp TEXT NOT NULL
+-- backend_ecom_server/schema.sql
+-- Baseline schema. Later changes live in migrations/ and are applied on top by database.migrate_db.
+
+PRAGMA user_version = 0;
+
+DROP TABLE IF EXISTS products_fts;
+DROP TABLE IF EXISTS products;
+DROP TABLE IF EXISTS users;
+DROP TABLE IF EXISTS carts;
+DROP TABLE IF EXISTS cart_items;
+DROP TABLE IF EXISTS orders;
+DROP TABLE IF EXISTS order_items;
+DROP TABLE IF EXISTS chat_logs; -- Table to store chat interactions
+
+CREATE TABLE products (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    category TEXT NOT NULL,
+    brand TEXT,
+    stock INTEGER NOT NULL,
+    image_url TEXT
+);
+
+CREATE TABLE users (
+    id TEXT PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL -- In a real app, store hashed passwords!
+);
+
+CREATE TABLE carts (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+CREATE TABLE cart_items (
+    id TEXT PRIMARY KEY,
+    cart_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    FOREIGN KEY (cart_id) REFERENCES carts (id),
+    FOREIGN KEY (product_id) REFERENCES products (id)
+);
+
+CREATE TABLE orders (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    order_date TEXT NOT NULL,
+    total_amount REAL NOT NULL,
+    status TEXT NOT NULL, -- e.g., 'pending', 'completed', 'shipped'
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+CREATE TABLE order_items (
+    id TEXT PRIMARY KEY,
+    order_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    price_at_purchase REAL NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES orders (id),
+    FOREIGN KEY (product_id) REFERENCES products (id)
+);
+
+CREATE TABLE chat_logs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    sender TEXT NOT NULL, -- 'user' or 'chatbot'
+    message TEXT NOT NULL,
+    timestamp TEXT NOT NULL
 );
\ No newline at end of file
@@ -0,0 +1,136 @@
+# backend_ecom_server/write_queue.py
+#
+# One writer thread per process for the cart and stock changes. Request handlers submit an
+# operation and wait on its future; the writer takes whatever has queued up (up to batch_size
+# operations, waiting at most max_delay for more) and runs it as one write transaction, each
+# operation in its own savepoint, with a single commit. During a rush on one product the requests
+# stop queueing on SQLite's write lock one commit at a time, and since the operations still run
+# one after another, each one's stock check sees the stock the previous one left: no overselling.
+# Each future also carries what its operation cost in SQL (future.sql), for the request's metrics.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import database
+from ecom_metrics import WRITE_BATCH_SIZE, WRITE_WAIT_SECONDS
+
+BATCH_SIZE = 256 # Most operations per commit
+MAX_DELAY = 0.0005 # Seconds the writer waits for more operations once a batch has started
+
+class WriteQueue:
+    def __init__(self, batch_size=BATCH_SIZE, max_delay=MAX_DELAY, on_commit=None):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.on_commit = on_commit # Called after each commit, before the batch's futures are resolved
+        self.batches = 0
+        self.operations = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None # Process the writer thread runs in; a forked child starts its own
+        self._start_lock = threading.Lock()
+        self._db = None
+        self._db_path = None
+
+    def submit(self, operation, *args):
+        """
+        Queues operation(db, *args) and returns a Future for what it returns (or raises). Once it is
+        done, future.sql is (statements, SQL seconds) the writer spent on the operation, including an
+        even share of its batch's BEGIN and COMMIT.
+        """
+        self._start()
+        future = Future()
+        self._queue.put((operation, args, future, time.perf_counter()))
+        return future
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.SimpleQueue() # Anything queued before a fork belongs to the parent
+                self._db = self._db_path = None
+                self._thread = threading.Thread(target=self._write_forever, name="ecom-writer", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _connection(self):
+        if self._db_path != database.DATABASE: # The benchmarks point database.py at a new file between runs
+            if self._db is not None:
+                self._db.close()
+            self._db = database.connect_db()
+            self._db_path = database.DATABASE
+        return self._db
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return batch
+
+    def _write_forever(self):
+        while True:
+            self._write(self._next_batch())
+
+    def _write(self, batch):
+        results = []
+        costs = [] # (statements, SQL seconds) per operation
+        db = None
+        try:
+            db = self._connection()
+            db.statements = 0 # Count this batch's SQL from zero
+            db.sql_seconds = 0.0
+            db.execute("BEGIN IMMEDIATE")
+            for operation, args, _, _ in batch:
+                statements, sql_seconds = db.statements, db.sql_seconds
+                db.execute("SAVEPOINT operation")
+                try:
+                    results.append((True, operation(db, *args)))
+                except Exception as e:
+                    db.execute("ROLLBACK TO operation") # Undo only this operation; the rest of the batch goes ahead
+                    results.append((False, e))
+                db.execute("RELEASE operation")
+                costs.append((db.statements - statements, db.sql_seconds - sql_seconds))
+            db.commit()
+        except Exception as e:
+            print(f"Error committing a batch of {len(batch)} writes: {e}")
+            if db is not None and db.in_transaction:
+                db.rollback()
+            self._charge(batch, costs, db)
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(batch)
+        if self.on_commit is not None:
+            self.on_commit()
+        WRITE_BATCH_SIZE.observe(len(batch))
+        self._charge(batch, costs, db)
+        committed_at = time.perf_counter()
+        for (_, _, future, queued_at), (ok, value) in zip(batch, results):
+            WRITE_WAIT_SECONDS.observe(committed_at - queued_at)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    def _charge(batch, costs, db):
+        """Sets each future's sql: its operation's own statements and time, plus a share of the rest."""
+        costs += [(0, 0.0)] * (len(batch) - len(costs)) # Operations a failed batch never got to
+        shared = 0.0 if db is None else (db.sql_seconds - sum(seconds for _, seconds in costs)) / len(batch)
+        for (_, _, future, _), (statements, sql_seconds) in zip(batch, costs):
+            future.sql = (statements, sql_seconds + shared)
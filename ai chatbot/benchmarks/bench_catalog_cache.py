@@ -0,0 +1,70 @@
+# benchmarks/bench_catalog_cache.py
+#
+# Latency of the catalog reads three ways: queried (response cache emptied before every call),
+# served from the response cache, and revalidated with If-None-Match (a 304). Drives the Flask
+# test client against a throwaway database and counts the SQL each way runs.
+#
+#   python benchmarks/bench_catalog_cache.py [--products 100000] [--runs 300]
+
+import argparse
+import statistics
+import time
+
+from ecom_fixture import load_app, make_database
+import catalog_cache
+import database
+
+REQUESTS = {
+    "search": "/products?q=gadget pro&limit=20",
+    "page": "/products?category=books&limit=100",
+    "details": "/products/prod-42",
+    "batch": "/products/batch?ids=prod-1,prod-2,prod-3,prod-4,prod-5",
+    "resolve": "/products/resolve?name=item42 gadget&name=item7",
+}
+
+def count_statements():
+    """Makes every new connection count into one shared list, so statements can be totalled per request."""
+    counted = []
+    execute = database.TimedConnection.execute
+
+    def counting_execute(self, sql, parameters=()):
+        counted.append(sql)
+        return execute(self, sql, parameters)
+    database.TimedConnection.execute = counting_execute
+    return counted
+
+def measure(client, url, runs, counted, headers=None, clear=False):
+    timings = []
+    statements = 0
+    for _ in range(runs):
+        if clear:
+            catalog_cache.response_cache.clear()
+        del counted[:]
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        response.get_data() # Streamed bodies are produced here
+        timings.append((time.perf_counter() - start) * 1e6)
+        statements += len(counted)
+        assert response.status_code == (304 if headers else 200), response.status_code
+    return statistics.median(timings), statements / runs
+
+def run(num_products, runs):
+    client = load_app(make_database(num_products=num_products)).test_client()
+    counted = count_statements()
+
+    print(f"{'request':>8} {'queried us':>11} {'sql':>5} {'cached us':>10} {'sql':>5} {'304 us':>8} {'sql':>5}")
+    for name, url in REQUESTS.items():
+        etag = client.get(url).headers['ETag']
+        queried, queried_sql = measure(client, url, runs, counted, clear=True)
+        client.get(url).get_data() # Back in the cache
+        cached, cached_sql = measure(client, url, runs, counted)
+        not_modified, not_modified_sql = measure(client, url, runs, counted, headers={"If-None-Match": etag})
+        print(f"{name:>8} {queried:>11.0f} {queried_sql:>5.1f} {cached:>10.0f} {cached_sql:>5.1f} "
+              f"{not_modified:>8.0f} {not_modified_sql:>5.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--runs', type=int, default=300)
+    args = parser.parse_args()
+    run(args.products, args.runs)
@@ -0,0 +1,45 @@
+# benchmarks/bench_checkout.py
+#
+# Checkout latency as the cart grows. Drives POST /checkout through the Flask test client
+# against a throwaway database; the cart is refilled directly in SQL between runs.
+#
+#   python benchmarks/bench_checkout.py [--sizes 1 5 20 50 100] [--runs 30]
+
+import argparse
+import sqlite3
+import statistics
+import time
+
+from ecom_fixture import TEST_USER_ID, load_app, make_database
+
+def fill_cart(db_path, num_lines):
+    conn = sqlite3.connect(db_path)
+    cart_id = conn.execute("SELECT id FROM carts WHERE user_id = ?", (TEST_USER_ID,)).fetchone()[0]
+    conn.executemany("INSERT INTO cart_items (id, cart_id, product_id, quantity) VALUES (?, ?, ?, 2)",
+                     ((f"line-{time.perf_counter_ns()}-{i}", cart_id, f"prod-{i}") for i in range(num_lines)))
+    conn.commit()
+    conn.close()
+
+def run(sizes, runs):
+    db_path = make_database(num_products=max(sizes))
+    client = load_app(db_path).test_client()
+
+    print(f"{'cart lines':>10} {'median ms':>10} {'p95 ms':>8}")
+    for size in sizes:
+        timings = []
+        for _ in range(runs):
+            fill_cart(db_path, size)
+            start = time.perf_counter()
+            response = client.post('/checkout', json={"user_id": TEST_USER_ID})
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.get_json()
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{size:>10} {statistics.median(timings):>10.2f} {p95:>8.2f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure checkout latency by cart size.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 20, 50, 100], help="cart lines per checkout")
+    parser.add_argument('--runs', type=int, default=30, help="checkouts per cart size")
+    args = parser.parse_args()
+    run(args.sizes, args.runs)
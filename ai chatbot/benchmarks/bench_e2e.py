@@ -0,0 +1,270 @@
+# benchmarks/bench_e2e.py
+#
+# End-to-end load benchmark of both services in one process. The chatbot gateway
+# (chatbot_logic/api_gateway.py) is driven through its Flask test client, and its calls to the
+# e-commerce server go through a requests adapter straight into the e-commerce app's test client,
+# so no sockets are involved. Synthetic conversations are replayed at each catalog size.
+# Per scenario intent it reports latency percentiles, the SQL statements each /chat turn ran
+# (plus, separately, the statements FTS5 ran internally for them) and how often the NLU routed
+# the turn to a different intent. Failed e-commerce calls are counted per endpoint rather than
+# printed one by one: most are checkouts of carts the conversation left empty, which get a 400.
+#
+#   python benchmarks/bench_e2e.py [--sizes 100 10000 1000000] [--turns 2000] [--seed 1]
+#                                  [--mix search=4,details=3,add=2,remove=1,view_cart=1,checkout=1]
+#                                  [--output results.json] [--baseline old.json --tolerance 0.2]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+
+from ecom_fixture import TEST_USER_ID, load_app, make_database
+import database
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chatbot_logic'))
+
+import api_gateway
+from name_index import ProductNameIndex
+from product_cache import ProductCache
+
+DEFAULT_MIX = "search=4,details=3,add=2,remove=1,view_cart=1,checkout=1"
+
+# What a user types for each scenario intent; {name} is a product name from the catalog
+TURN_TEMPLATES = {
+    "search": ["search for {name}", "show me {name}", "find {name} category electronics"],
+    "details": ["tell me about {name}", "details about {name}"],
+    "add": ["buy {name}", "add 2 {name} to cart"],
+    "remove": ["remove {name} from cart"],
+    "view_cart": ["what's in my cart?", "view cart"],
+    "checkout": ["checkout", "place order"],
+}
+# The NLU intent each scenario intent should be recognized as
+EXPECTED_INTENT = {"search": "search_product", "details": "product_details", "add": "add_to_cart",
+                   "remove": "remove_from_cart", "view_cart": "view_cart", "checkout": "checkout"}
+
+class TestClientAdapter(requests.adapters.BaseAdapter):
+    """A requests transport that hands each request to a Flask test client instead of the network."""
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self.http_adapter = requests.adapters.HTTPAdapter() # Only for build_response()
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        result = self.client.open(url.path + (f"?{url.query}" if url.query else ""), method=request.method,
+                                  data=request.body, headers=dict(request.headers))
+        # Wrapped as urllib3 would return it, so gzip/deflate bodies get decoded as they would off a socket
+        raw = urllib3.HTTPResponse(body=io.BytesIO(result.get_data()), # Also drains streamed responses
+                                   headers=list(result.headers.items()), status=result.status_code,
+                                   reason=result.status.split(" ", 1)[-1], preload_content=False, decode_content=True)
+        return self.http_adapter.build_response(request, raw)
+
+    def close(self):
+        pass
+
+class StatementCounter:
+    """
+    Counts the SQL statements each thread runs, via a trace callback on every new connection.
+    Statements that SQLite runs on behalf of another one (FTS5 reading its shadow tables) are
+    traced with a leading "--" and counted apart. The server's writer thread runs cart and stock
+    changes on behalf of the turn waiting on them, so its statements go to the next take().
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._writer_counts = [0, 0]
+        connect_db = database.connect_db
+
+        def traced_connect_db(read_only=False):
+            db = connect_db(read_only)
+            db.set_trace_callback(self._count)
+            return db
+        database.connect_db = traced_connect_db
+
+    def _count(self, sql):
+        counts = self._counts()
+        counts[1 if sql.startswith("--") else 0] += 1
+
+    def _counts(self):
+        if threading.current_thread().name == "ecom-writer":
+            return self._writer_counts
+        if not hasattr(self._local, 'counts'):
+            self._local.counts = [0, 0]
+        return self._local.counts
+
+    def take(self):
+        """Returns this thread's (statements, nested statements) since the last take()."""
+        counts = self._counts()
+        taken = (counts[0] + self._writer_counts[0], counts[1] + self._writer_counts[1])
+        self._local.counts = [0, 0]
+        self._writer_counts[:] = [0, 0]
+        return taken
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        intent, _, weight = part.partition('=')
+        if intent not in TURN_TEMPLATES:
+            raise SystemExit(f"Unknown intent in --mix: {intent} (expected one of {', '.join(TURN_TEMPLATES)})")
+        mix[intent] = float(weight or 1)
+    return mix
+
+def make_turns(num_turns, mix, catalog_size, rng, conversation_length=8):
+    """A deterministic list of (session key, scenario intent, query), grouped into conversations."""
+    intents, weights = list(mix), list(mix.values())
+    turns = []
+    while len(turns) < num_turns:
+        conversation = f"c{len(turns)}"
+        for intent in rng.choices(intents, weights, k=conversation_length):
+            name = f"item{rng.randrange(catalog_size)} gadget pro"
+            turns.append((conversation, intent, rng.choice(TURN_TEMPLATES[intent]).format(name=name)))
+    return turns[:num_turns]
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def summarize(timings_ms, statements):
+    timings_ms = sorted(timings_ms)
+    return {
+        "count": len(timings_ms),
+        "mean_ms": round(statistics.fmean(timings_ms), 3),
+        "p50_ms": round(percentile(timings_ms, 0.50), 3),
+        "p95_ms": round(percentile(timings_ms, 0.95), 3),
+        "p99_ms": round(percentile(timings_ms, 0.99), 3),
+        "sql_per_request": round(statistics.fmean(n for n, _ in statements), 2),
+        "nested_sql_per_request": round(statistics.fmean(nested for _, nested in statements), 2),
+    }
+
+def run_size(gateway_app, catalog_size, turns, counter):
+    build_start = time.perf_counter()
+    backend = load_app(make_database(num_products=catalog_size)).test_client()
+    build_seconds = time.perf_counter() - build_start
+
+    chatbot = gateway_app.chatbot
+    chatbot.product_cache = ProductCache() # Nothing cached from the previous catalog
+    chatbot.http.mount("http://", TestClientAdapter(backend))
+    chatbot.log_shipper._http.mount("http://", TestClientAdapter(backend))
+    chatbot.name_index.stop() # Every size is a new catalog (and epoch): start from an empty index
+    chatbot.name_index = ProductNameIndex()
+    chatbot.name_index.sync(chatbot._fetch_names) # Loaded up front: the timed turns measure the steady state
+    chatbot.facet_matcher.refresh(chatbot._fetch_facets)
+    gateway = gateway_app.test_client()
+    session_ids = {}
+    by_intent = {intent: {"timings": [], "statements": [], "misrouted": 0} for intent in TURN_TEMPLATES}
+
+    errors_before = {key: stats["errors"] for key, stats in chatbot.get_api_stats().items()}
+    counter.take()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # The gateway prints each failed call; they're counted below instead
+        for conversation, intent, query in turns:
+            turn_start = time.perf_counter()
+            response = gateway.post('/chat', json={
+                "query": query, "session_id": session_ids.get(conversation), "user_id": TEST_USER_ID,
+                "logged_in_user_id": TEST_USER_ID, "logged_in_username": "testuser"})
+            elapsed_ms = (time.perf_counter() - turn_start) * 1000
+            assert response.status_code == 200, response.get_json()
+            session_ids[conversation] = response.get_json()['session_id']
+            stats = by_intent[intent]
+            stats["timings"].append(elapsed_ms)
+            stats["statements"].append(counter.take())
+    elapsed = time.perf_counter() - start
+    api_errors = {key: stats["errors"] - errors_before.get(key, 0) for key, stats in chatbot.get_api_stats().items()}
+
+    # Routing is checked outside the timed loop, on a fresh session so context doesn't matter
+    session = api_gateway.ChatSession()
+    for _, intent, query in turns:
+        if chatbot._recognize_intent_and_entities(query, session)[0] != EXPECTED_INTENT[intent]:
+            by_intent[intent]["misrouted"] += 1
+
+    all_timings = [t for stats in by_intent.values() for t in stats["timings"]]
+    all_statements = [n for stats in by_intent.values() for n in stats["statements"]]
+    return {
+        "catalog_size": catalog_size,
+        "build_seconds": round(build_seconds, 2),
+        "turns": len(turns),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(turns) / elapsed, 1),
+        "overall": summarize(all_timings, all_statements),
+        "api_errors": {key: count for key, count in sorted(api_errors.items()) if count},
+        "intents": {
+            intent: dict(summarize(stats["timings"], stats["statements"]), misrouted=stats["misrouted"])
+            for intent, stats in by_intent.items() if stats["timings"]
+        },
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Returns a line per regression: p95 latency up or throughput down by more than tolerance, or
+    more SQL statements per request (those counts are deterministic, so any increase is real).
+    """
+    previous = {run["catalog_size"]: run for run in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        old = previous.get(run["catalog_size"])
+        if old is None:
+            continue
+        if run["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{run['catalog_size']} products: throughput "
+                               f"{old['throughput_rps']} -> {run['throughput_rps']} req/s")
+        for intent, stats in run["intents"].items():
+            old_stats = old["intents"].get(intent)
+            if old_stats and stats["p95_ms"] > old_stats["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{run['catalog_size']} products, {intent}: p95 "
+                                   f"{old_stats['p95_ms']} -> {stats['p95_ms']} ms")
+            if old_stats and stats["sql_per_request"] > old_stats["sql_per_request"] + 0.01:
+                regressions.append(f"{run['catalog_size']} products, {intent}: SQL statements per request "
+                                   f"{old_stats['sql_per_request']} -> {stats['sql_per_request']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic conversations through both services in-process.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000], help="catalog sizes to test")
+    parser.add_argument('--turns', type=int, default=2000, help="chat turns per catalog size")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="relative weight per scenario intent")
+    parser.add_argument('--seed', type=int, default=1, help="seed for the generated conversations")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="earlier --output file; exit 1 if this run regressed against it")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed regression vs --baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    counter = StatementCounter()
+    gateway_app = api_gateway.create_app(warm=False) # Loaded per size below, once its catalog exists
+    results = {"config": {"turns": args.turns, "mix": mix, "seed": args.seed}, "runs": []}
+    print(f"{'products':>9} {'req/s':>8} {'intent':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'sql/req':>8} {'fts/req':>8} {'misrouted':>9}")
+    for size in args.sizes:
+        turns = make_turns(args.turns, mix, size, random.Random(args.seed))
+        run = run_size(gateway_app, size, turns, counter)
+        results["runs"].append(run)
+        for intent, stats in dict(run["intents"], all=dict(run["overall"], misrouted="")).items():
+            print(f"{size:>9} {run['throughput_rps']:>8} {intent:>10} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                  f"{stats['p99_ms']:>8.2f} {stats['sql_per_request']:>8.2f} {stats['nested_sql_per_request']:>8.2f} "
+                  f"{stats['misrouted']:>9}")
+        if run["api_errors"]:
+            print(f"{'':>9} failed e-commerce calls: " + ", ".join(f"{key} {count}" for key, count in run["api_errors"].items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# benchmarks/bench_gateway_async.py
+#
+# Chat throughput of the sync (Flask) and async (ASGI) gateway modes when the e-commerce server is
+# slow. A stub e-commerce server answers every call after --latency ms; the Flask gateway is driven
+# from --concurrency threads, the ASGI gateway from --concurrency coroutines in one thread.
+# Needs aiohttp and uvicorn (see requirements.txt).
+#
+#   python benchmarks/bench_gateway_async.py [--chats 2000] [--concurrency 200] [--latency 50]
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chatbot_logic'))
+
+import requests
+import uvicorn
+
+import api_gateway
+import asgi_gateway
+from chatbot import SalesChatbot
+
+USER_ID = "test_user_123"
+
+def make_stub_server(latency):
+    """An ASGI stand-in for the e-commerce server: canned answers to the gateway's calls, each after latency seconds."""
+    product_route = re.compile(r"/products/([^/]+)")
+
+    def product(product_id):
+        return {"id": product_id, "name": f"Item {product_id}", "description": "Stub product", "price": 9.99,
+                "category": "Electronics", "brand": "TechGen", "stock": 100, "image_url": ""}
+
+    async def stub(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await asyncio.sleep(latency)
+        path = scope["path"]
+        if path == "/products":
+            payload = {"products": [product("prod-1")], "next_cursor": None}
+        elif product_route.fullmatch(path):
+            payload = product(product_route.fullmatch(path).group(1))
+        elif path == "/cart/add":
+            payload = {"message": "Added 1 x Item prod-1 to cart."}
+        elif path.startswith("/cart/"):
+            payload = {"items": [], "total_price": 0}
+        else: # /catalog/version, /chat_logs/batch
+            payload = {"version": 1}
+        body = json.dumps(payload).encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json"), (b"x-catalog-version", b"1")]})
+        await send({"type": "http.response.body", "body": body})
+
+    return stub
+
+def serve_stub(sock, latency):
+    uvicorn.Server(uvicorn.Config(make_stub_server(latency), log_level="warning", backlog=4096)).run(sockets=[sock])
+
+def start_stub_server(latency):
+    """Runs the stub server in its own process, so it doesn't compete with the gateway for the GIL."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    multiprocessing.Process(target=serve_stub, args=(sock, latency), daemon=True).start()
+    for _ in range(500):
+        try:
+            requests.get(f"{url}/catalog/version")
+            return url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.01)
+    raise RuntimeError("stub e-commerce server did not start")
+
+def chat_request(n):
+    # Distinct product names, so every chat needs the server (no product cache hits)
+    queries = ["search for item{n}", "tell me about item{n} special", "buy item{n} extra"]
+    return {"query": queries[n % len(queries)].format(n=n), "user_id": USER_ID,
+            "logged_in_user_id": USER_ID, "logged_in_username": "bench"}
+
+def run_sync(app, chats, concurrency):
+    client = app.test_client()
+
+    def one_chat(n):
+        response = client.post('/chat', json=chat_request(n))
+        assert response.status_code == 200, response.get_json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_chat, range(chats)))
+    return time.perf_counter() - start
+
+async def asgi_post(app, path, payload):
+    """Calls an ASGI app in-process the way a server would. Returns (status, parsed JSON body)."""
+    body = json.dumps(payload).encode()
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": [(b"content-type", b"application/json")]}
+    response = {"status": None, "body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], json.loads(response["body"])
+
+async def run_async(app, chats, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one_chat(n):
+        async with limit:
+            status, body = await asgi_post(app, '/chat', chat_request(n))
+            assert status == 200, body
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_chat(n) for n in range(chats)))
+    elapsed = time.perf_counter() - start
+    await app.chatbot.aclose()
+    return elapsed
+
+def run(chats, concurrency, latency_ms):
+    # One chatbot behind both modes, so the call counts below cover both
+    chatbot = SalesChatbot(ecom_server_url=start_stub_server(latency_ms / 1000), async_pool_size=concurrency)
+    sync_app = api_gateway.create_app(chatbot, warm=False)
+    async_app = asgi_gateway.create_app(chatbot, warm=False)
+
+    print(f"{chats} chats, {concurrency} in flight, {latency_ms} ms per e-commerce call")
+    for mode, elapsed in (("sync (threads)", run_sync(sync_app, chats, concurrency)),
+                          ("async (ASGI)", asyncio.run(run_async(async_app, chats, concurrency)))):
+        print(f"{mode:>15}: {elapsed:.2f}s -> {chats / elapsed:.0f} chats/s")
+    print("e-commerce calls:", {key: stats["calls"] for key, stats in chatbot.get_api_stats().items()})
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare sync and async gateway throughput against a slow server.")
+    parser.add_argument('--chats', type=int, default=2000, help="chat requests per mode")
+    parser.add_argument('--concurrency', type=int, default=200, help="chats in flight at once")
+    parser.add_argument('--latency', type=float, default=50, help="stub server delay per call, in ms")
+    args = parser.parse_args()
+    run(args.chats, args.concurrency, args.latency)
@@ -0,0 +1,85 @@
+# benchmarks/bench_hot_sku.py
+#
+# A rush on one product: many threads, each a different shopper, POST /cart/add for the same
+# product until its stock runs out. Runs once with cart and stock changes group-committed by the
+# writer thread (app.GROUP_COMMIT) and once with a transaction per request, reporting adds/s and
+# latency, then checks nothing was oversold: the stock left is the starting stock minus the adds
+# that succeeded, never below zero, and the carts hold exactly those adds.
+#
+#   python benchmarks/bench_hot_sku.py [--products 1000] [--threads 32] [--stock 5000]
+
+import argparse
+import sqlite3
+import statistics
+import threading
+import time
+
+from ecom_fixture import load_app, make_database
+import app as backend # Importable once ecom_fixture has put backend_ecom_server on sys.path
+
+HOT_PRODUCT = "prod-0"
+
+def shopper(client, number, timings, added):
+    i = 0
+    while True:
+        start = time.perf_counter()
+        response = client.post('/cart/add', json={"user_id": f"shopper-{number}-{i}", "product_id": HOT_PRODUCT})
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code == 400: # Sold out
+            return
+        assert response.status_code == 200, response.get_json()
+        timings.append(elapsed)
+        added.append(1)
+        i += 1
+
+def check_stock(db_path, stock, added):
+    conn = sqlite3.connect(db_path)
+    left = conn.execute("SELECT stock FROM products WHERE id = ?", (HOT_PRODUCT,)).fetchone()[0]
+    in_carts = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM cart_items WHERE product_id = ?", (HOT_PRODUCT,)).fetchone()[0]
+    conn.close()
+    assert left >= 0, f"stock went negative: {left}"
+    assert left == stock - added, f"stock left {left}, expected {stock} - {added} = {stock - added}"
+    assert in_carts == added, f"{in_carts} in carts, {added} adds succeeded"
+    return left
+
+def run_mode(num_products, threads, stock, group_commit):
+    db_path = make_database(num_products=num_products)
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE products SET stock = ? WHERE id = ?", (stock, HOT_PRODUCT))
+    conn.commit()
+    conn.close()
+    client = load_app(db_path).test_client()
+    backend.GROUP_COMMIT = group_commit
+    batches, operations = backend.write_queue.batches, backend.write_queue.operations
+
+    timings, added = [], []
+    workers = [threading.Thread(target=shopper, args=(client, n, timings, added)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - start
+
+    left = check_stock(db_path, stock, len(added))
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    batches = backend.write_queue.batches - batches
+    operations = backend.write_queue.operations - operations
+    per_batch = f"{operations / batches:.1f}" if batches else "-"
+    print(f"{'group' if group_commit else 'per request':>12} {len(added) / seconds:>7.0f} "
+          f"{statistics.median(timings):>7.2f} {p99:>7.2f} {len(added):>6} {left:>5} {per_batch:>10}")
+
+def run(num_products, threads, stock):
+    print(f"{threads} shoppers, {stock} in stock")
+    print(f"{'commits':>12} {'adds/s':>7} {'p50 ms':>7} {'p99 ms':>7} {'added':>6} {'left':>5} {'ops/batch':>10}")
+    for group_commit in (True, False):
+        run_mode(num_products, threads, stock, group_commit)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--stock', type=int, default=5000)
+    args = parser.parse_args()
+    run(args.products, args.threads, args.stock)
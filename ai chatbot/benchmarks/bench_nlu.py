@@ -0,0 +1,71 @@
+# benchmarks/bench_nlu.py
+#
+# Micro-benchmark for SalesChatbot._recognize_intent_and_entities (the NLU step).
+# No servers are needed: only intent and entity extraction is timed.
+#
+#   python benchmarks/bench_nlu.py [--rounds 2000]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chatbot_logic'))
+
+from chatbot import SalesChatbot
+from chat_session import ChatSession
+
+# A mix of the message shapes the gateway sees, roughly one per intent
+QUERIES = [
+    "Hi there",
+    "thanks a lot!",
+    "ok bye",
+    "please reset the conversation",
+    "how do I log in",
+    "I want to checkout now",
+    "what's in my cart?",
+    "remove this from cart",
+    "Add Laptop Pro to cart",
+    "add 2 laptop pro and 3 x mouse to cart",
+    "add 2 tv and 3 to cart", # A trailing quantity with no name: not a list of items
+    "tell me about the Laptop Pro",
+    "show me some laptops",
+    "search for running shoes category sports",
+    "find headphones brand techgen",
+    "look for shoes $20 to $50",
+    "show products",
+    "do you sell umbrellas",
+    "any techgen headphones?",
+    "home and kitchen stuff under $50",
+]
+
+# The vocabulary the facet matcher would load from GET /products/facets for mock_data.py's catalog
+FACETS = {
+    "categories": [{"name": name} for name in ['Electronics', 'Home & Kitchen', 'Books', 'Clothing', 'Sports', 'Beauty']],
+    "brands": [{"name": name} for name in ['TechGen', 'HomeLux', 'PageTurner', 'FashionFlow', 'FitLife', 'GlowUp']],
+}
+
+def run(rounds):
+    chatbot = SalesChatbot()
+    chatbot.facet_matcher.load(FACETS)
+    session = ChatSession()
+    recognize = chatbot._recognize_intent_and_entities
+
+    # Warm up so regex compilation and caches aren't counted
+    for query in QUERIES:
+        recognize(query, session)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in QUERIES:
+            recognize(query, session)
+    elapsed = time.perf_counter() - start
+
+    calls = rounds * len(QUERIES)
+    print(f"{calls} queries in {elapsed:.3f}s -> {elapsed / calls * 1e6:.2f} us/query")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time intent and entity recognition per query.")
+    parser.add_argument('--rounds', type=int, default=2000, help="passes over the query mix")
+    args = parser.parse_args()
+    run(args.rounds)
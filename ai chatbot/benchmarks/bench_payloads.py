@@ -0,0 +1,63 @@
+# benchmarks/bench_payloads.py
+#
+# Size and cost of large catalog listings: bytes on the wire for full products vs a ?fields=
+# projection, uncompressed vs gzip/deflate, with the server time for each (response cache emptied
+# before every request); then the time to serialize one page with the standard json module (as
+# Flask's default provider did) vs orjson.
+#
+#   python benchmarks/bench_payloads.py [--products 100000] [--limit 500] [--runs 50]
+
+import argparse
+import json
+import statistics
+import time
+
+import orjson
+
+from ecom_fixture import load_app, make_database
+import catalog_cache
+
+VARIANTS = [
+    ("all fields", "", None),
+    ("all fields", "", "gzip"),
+    ("all fields", "", "deflate"),
+    ("id,name,price", "&fields=id,name,price", None),
+    ("id,name,price", "&fields=id,name,price", "gzip"),
+]
+
+def median_ms(function, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def run(num_products, limit, runs):
+    client = load_app(make_database(num_products=num_products)).test_client()
+    url = f"/products?category=books&limit={limit}"
+
+    print(f"{'fields':>14} {'encoding':>9} {'bytes':>9} {'server ms':>10}")
+    for label, fields, encoding in VARIANTS:
+        headers = {"Accept-Encoding": encoding or "identity"}
+
+        def fetch():
+            catalog_cache.response_cache.clear()
+            response = client.get(url + fields, headers=headers)
+            assert response.headers.get('Content-Encoding') == encoding
+            return response.get_data()
+        size = len(fetch())
+        print(f"{label:>14} {encoding or 'identity':>9} {size:>9} {median_ms(fetch, runs):>10.2f}")
+
+    products = client.get(url, headers={"Accept-Encoding": "identity"}).get_json()['products']
+    stdlib = median_ms(lambda: json.dumps(products, sort_keys=True, separators=(",", ":")).encode(), runs)
+    fast = median_ms(lambda: orjson.dumps(products), runs)
+    print(f"\nserializing {len(products)} products: json {stdlib:.2f} ms, orjson {fast:.2f} ms ({stdlib / fast:.1f}x)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+    run(args.products, args.limit, args.runs)
@@ -0,0 +1,94 @@
+# benchmarks/bench_read_write.py
+#
+# Catalog read throughput while writer processes hammer the write paths (cart adds, checkouts and
+# chat log batches), as other server workers would. Runs each mix with reads on the read-only
+# connections and, for comparison, with everything on the read-write ones
+# (database.READ_ONLY_CONNECTIONS = False). Readers are threads in this process; everything drives
+# the Flask test client against one throwaway database.
+#
+#   python benchmarks/bench_read_write.py [--products 100000] [--readers 4] [--writers 4] [--seconds 5]
+
+import argparse
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+
+from ecom_fixture import TEST_USER_ID, load_app, make_database
+import catalog_cache
+import database
+
+def reader(client, num_products, stop, timings):
+    rng = random.Random()
+    while not stop.is_set():
+        if rng.random() < 0.5:
+            url = f"/products/prod-{rng.randrange(num_products)}"
+        else:
+            url = f"/products?q=item{rng.randrange(1000)}&limit=10"
+        start = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+
+def writer(db_path, num_products, stop, writes, user_id):
+    """A writer process: its own app instance on the same database file."""
+    client = load_app(db_path).test_client()
+    rng = random.Random()
+    while not stop.is_set():
+        for _ in range(10):
+            response = client.post('/cart/add', json={"user_id": user_id, "product_id": f"prod-{rng.randrange(num_products)}"})
+            assert response.status_code == 200, response.get_json()
+        client.post('/checkout', json={"user_id": user_id})
+        client.post('/chat_logs/batch', json={"logs": [{"session_id": user_id, "sender": "user", "message": "hi"}] * 20})
+        with writes.get_lock():
+            writes.value += 12
+
+def run_mix(client, db_path, num_products, readers, writers, seconds):
+    context = multiprocessing.get_context('spawn') # A fresh interpreter, not a fork of this one's open connections
+    stop = context.Event()
+    writes = context.Value('i', 0)
+    processes = [context.Process(target=writer, args=(db_path, num_products, stop, writes, f"{TEST_USER_ID}-{i}"))
+                 for i in range(writers)]
+    for process in processes:
+        process.start()
+    time.sleep(1.0 if writers else 0) # Let the writers get going
+
+    timings = []
+    stop_reading = threading.Event()
+    threads = [threading.Thread(target=reader, args=(client, num_products, stop_reading, timings)) for _ in range(readers)]
+    writes_before = writes.value
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop_reading.set()
+    for thread in threads:
+        thread.join()
+    written = writes.value - writes_before
+    stop.set()
+    for process in processes:
+        process.join()
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return len(timings) / seconds, statistics.median(timings), p99, written / seconds
+
+def run(num_products, readers, writers, seconds):
+    db_path = make_database(num_products=num_products)
+    client = load_app(db_path).test_client()
+    catalog_cache.response_cache.max_body = 0 # Every read goes to SQLite, with or without writes bumping the catalog version
+    print(f"{'reads via':>10} {'writers':>8} {'reads/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'writes/s':>9}")
+    for read_only in (True, False):
+        database.READ_ONLY_CONNECTIONS = read_only
+        for num_writers in (0, writers):
+            reads, p50, p99, writes = run_mix(client, db_path, num_products, readers, num_writers, seconds)
+            print(f"{'read-only' if read_only else 'shared':>10} {num_writers:>8} {reads:>8.0f} {p50:>7.2f} {p99:>7.2f} {writes:>9.0f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+    run(args.products, args.readers, args.writers, args.seconds)
@@ -0,0 +1,55 @@
+# benchmarks/bench_sessions.py
+#
+# Memory footprint of the gateway's chat sessions. Creates N sessions in the in-memory session
+# store, each with a short conversation and a remembered search, and reports the bytes allocated
+# per session (tracemalloc, so session store bookkeeping is included).
+#
+#   python benchmarks/bench_sessions.py [--sessions 100000] [--turns 10] [--results 10]
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chatbot_logic'))
+
+from chat_session import ChatSession
+from session_store import MemorySessionStore
+
+def fill_session(session, n, turns, results):
+    # Distinct strings per session, as messages arriving over the wire would be
+    for turn in range(turns):
+        session.add_message("user", f"show me laptops under ${300 + turn * 50} from techgen ({n})")
+        session.add_message("chatbot", f"Here are some results for laptops under ${300 + turn * 50}: ({n})")
+    product_ids = tuple(f"prod-{n * results + k:07d}" for k in range(results))
+    session.update_context('last_searched_product_ids', product_ids)
+    session.update_context('last_viewed_product_id', product_ids[0])
+
+def run(num_sessions, turns, results):
+    ChatSession.store = MemorySessionStore(max_entries=num_sessions) # Nothing evicted while measuring
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for n in range(num_sessions):
+        fill_session(ChatSession(), n, turns, results)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    assert len(ChatSession.store) == num_sessions
+    print(f"{num_sessions} sessions, {turns * 2} messages and {results} remembered results each")
+    print(f"total {used / 2**20:.1f} MiB -> {used / num_sessions:.0f} bytes/session "
+          f"(built in {elapsed:.2f}s)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure per-session memory at many concurrent sessions.")
+    parser.add_argument('--sessions', type=int, default=100000, help="concurrent sessions to create")
+    parser.add_argument('--turns', type=int, default=10, help="user/chatbot exchanges per session")
+    parser.add_argument('--results', type=int, default=10, help="products remembered from the last search")
+    args = parser.parse_args()
+    run(args.sessions, args.turns, args.results)
@@ -0,0 +1,97 @@
+# benchmarks/bench_startup.py
+#
+# How fast new workers can join. First, a fresh interpreter per service: time to import its app
+# module and to build the app with create_app(). Then the e-commerce server as a pre-forking server
+# runs it (gunicorn --preload): the app is built once, workers are forked from it, and each
+# worker's first catalog reads are timed from the fork, with and without the warm-up in the parent.
+# Forks with os.fork, so Unix only.
+#
+#   python benchmarks/bench_startup.py [--products 100000] [--forks 20] [--runs 5]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from ecom_fixture import BACKEND_DIR, load_app, make_database
+import catalog_cache
+
+GATEWAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chatbot_logic')
+
+# Run in a fresh interpreter; prints the import and create_app() times as JSON
+STARTUP_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{setup}
+building = time.perf_counter()
+{module}.create_app(warm={warm})
+print(json.dumps({{"import": imported - start, "create_app": time.perf_counter() - building}}))
+"""
+
+# A new worker's first requests: what the chatbot and the web UI ask for as they connect
+FIRST_REQUESTS = ('/catalog/version', '/products/facets', '/products?limit=20', '/products/prod-42')
+
+def cold_start(path, module, warm, setup, cwd):
+    """(import seconds, create_app seconds, whole process seconds) for one fresh interpreter."""
+    script = STARTUP_SCRIPT.format(path=path, module=module, warm=warm, setup=setup)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, cwd=cwd).stdout
+    elapsed = time.perf_counter() - start
+    times = json.loads(output.strip().splitlines()[-1])
+    return times["import"], times["create_app"], elapsed
+
+def first_requests_after_fork(app):
+    """Forks a worker from this process and returns the seconds from the fork to its first responses."""
+    read_end, write_end = os.pipe()
+    forked_at = time.perf_counter() # A system-wide clock, so the child can subtract it
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        client = app.test_client()
+        for path in FIRST_REQUESTS:
+            response = client.get(path)
+            response.get_data()
+            assert response.status_code == 200, response.status_code
+        os.write(write_end, str(time.perf_counter() - forked_at).encode())
+        os._exit(0)
+    os.close(write_end)
+    with os.fdopen(read_end) as pipe:
+        seconds = float(pipe.read())
+    os.waitpid(pid, 0)
+    return seconds
+
+def run(num_products, forks, runs):
+    db_path = make_database(num_products=num_products)
+    backend_setup = f"import database; database.DATABASE = {db_path!r}"
+    print(f"{'fresh interpreter':>24} {'import ms':>10} {'create_app ms':>14} {'process ms':>11}")
+    for name, path, module, warm, setup in (
+            ("e-commerce, no warm-up", BACKEND_DIR, "app", False, backend_setup),
+            ("e-commerce, warm-up", BACKEND_DIR, "app", True, backend_setup),
+            ("gateway (Flask)", GATEWAY_DIR, "api_gateway", False, ""),
+            ("gateway (ASGI)", GATEWAY_DIR, "asgi_gateway", False, "")):
+        # Run next to the throwaway database, so a real ecom_data.db is never touched
+        samples = [cold_start(path, module, warm, setup, os.path.dirname(db_path)) for _ in range(runs)]
+        imported, built, elapsed = (statistics.median(column) * 1000 for column in zip(*samples))
+        print(f"{name:>24} {imported:>10.1f} {built:>14.1f} {elapsed:>11.1f}")
+
+    print(f"\n{'forked worker':>24} {'first ms':>10} {'p50 ms':>14} {'max ms':>11}")
+    for warm in (False, True):
+        catalog_cache.response_cache.clear() # Nothing left over from the other mode
+        app = load_app(db_path, warm=warm)
+        timings = [first_requests_after_fork(app) * 1000 for _ in range(forks)]
+        print(f"{'parent warmed up' if warm else 'parent not warmed up':>24} {timings[0]:>10.2f} "
+              f"{statistics.median(timings):>14.2f} {max(timings):>11.2f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure app startup and time to first response of forked workers.")
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--forks', type=int, default=20, help="workers forked per mode")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per service")
+    args = parser.parse_args()
+    run(args.products, args.forks, args.runs)
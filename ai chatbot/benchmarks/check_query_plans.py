@@ -0,0 +1,125 @@
+# benchmarks/check_query_plans.py
+#
+# Calls every e-commerce endpoint once against a throwaway database, records the SQL it runs,
+# and fails (exit status 1) if EXPLAIN QUERY PLAN shows a full table scan for any of it, or a
+# sort (temp B-tree) for a GET /products page, which should come out of an index in rowid order.
+# An endpoint that answers with a server error fails it too, since its SQL went unchecked.
+# Meant to run after every schema, migration or query change, like a test.
+#
+#   python benchmarks/check_query_plans.py
+
+import json
+import re
+import sys
+
+from ecom_fixture import TEST_USER_ID, load_app, make_database
+import database # Importable once ecom_fixture has put backend_ecom_server on sys.path
+
+# Statements whose plan says SCAN but that are fine
+ALLOWED_FULL_SCANS = [
+    # First page of the unfiltered catalog: walks the table in rowid order, but stops at LIMIT
+    re.compile(r"^SELECT p\.\w+(, p\.\w+)*, p\.rowid AS sort_key, p\.rowid AS row_id FROM products p WHERE 1=1 ORDER BY p\.rowid LIMIT \d+$"),
+    # GET /catalog/names without ?since: a snapshot of every name, read once per gateway start
+    re.compile(r"^SELECT id, name FROM products ORDER BY rowid$"),
+    # GET /products/facets: every price bucket, a handful of rows fixed by migration 007
+    re.compile(r"^SELECT b\.min_price, .* FROM price_buckets b LEFT JOIN product_facets f "),
+]
+
+# Rowid-ordered pages whose plan sorts but that are fine
+ALLOWED_SORTS = [
+    # A price range alone: idx_products_price finds the range, and only the rows in it are sorted
+    re.compile(r"^SELECT .* FROM products p WHERE 1=1( AND p\.price [<>]= \S+)+( AND p\.rowid > \d+)? ORDER BY p\.rowid LIMIT \d+$"),
+]
+
+ROWID_PAGE = re.compile(r"ORDER BY p\.rowid LIMIT \d+$")
+
+# "SCAN products" is a full scan; "SCAN products USING (COVERING) INDEX ...", virtual tables,
+# "SCAN (subquery-N)" over already-fetched rows and "SCAN n CONSTANT ROWS" (a VALUES list) are not
+FULL_SCAN = re.compile(r"^SCAN (?!\()(\S+)(?!\S)(?! USING| VIRTUAL TABLE| CONSTANT ROWS)")
+MATERIALIZED = re.compile(r"^MATERIALIZE (\S+)$") # A CTE built from the request's own parameters
+
+def exercise_endpoints(client):
+    product_id = "prod-1"
+    client.post('/login', json={"username": "testuser", "password": "password"})
+    client.get('/products')
+    client.get('/products?q=gadget')
+    client.get('/products?query=item1 pro&category=electronics&brand=techgen&min_price=5&max_price=500')
+    client.get('/products?category=books')
+    client.get('/products?brand=fitlife&max_price=100')
+    client.get('/products?min_price=20&max_price=30')
+    epoch = json.loads(client.get('/catalog/names').get_data())['epoch']
+    client.get(f'/catalog/names?since=0&epoch={epoch}')
+    for page_one in ('/products?limit=5', '/products?q=gadget&limit=5', '/products?category=books&limit=5',
+                     '/products?brand=fitlife&max_price=100&limit=5'):
+        next_cursor = client.get(page_one).get_json()['next_cursor']
+        client.get(f'{page_one}&cursor={next_cursor}')
+    client.get(f'/products?id={product_id}')
+    client.get(f'/products/{product_id}')
+    client.get('/products/batch?ids=prod-1,prod-2,prod-none')
+    client.get('/products/resolve?name=item1 gadget&name=item22&name=no such thing')
+    client.get('/products/facets')
+    client.get('/products?q=gadget&fields=name,price')
+    client.get(f'/products/{product_id}?fields=name,price,stock')
+    client.post('/cart/add', json={"user_id": TEST_USER_ID, "product_id": product_id, "quantity": 2})
+    client.post('/cart/add', json={"user_id": TEST_USER_ID, "product_id": product_id})
+    client.get(f'/cart/{TEST_USER_ID}')
+    client.get(f'/cart/{TEST_USER_ID}?fields=name,quantity')
+    client.post('/cart/remove', json={"user_id": TEST_USER_ID, "product_id": product_id, "quantity": 1})
+    client.post('/cart/add', json={"user_id": TEST_USER_ID, "product_id": "prod-2"})
+    client.post('/cart/add_many', json={"user_id": TEST_USER_ID, "items": [
+        {"product_id": "prod-2", "quantity": 2}, {"product_id": "prod-3", "quantity": 3}]})
+    client.post('/checkout', json={"user_id": TEST_USER_ID})
+    client.post('/chat_logs', json={"session_id": "s1", "sender": "user", "message": "hi"})
+    client.post('/chat_logs/batch', json={"logs": [{"session_id": "s1", "sender": "chatbot", "message": "hello"}]})
+
+def main():
+    db_path = make_database(num_products=2000)
+    statements = []
+
+    connect_db = database.connect_db
+    def traced_connect_db(read_only=False):
+        db = connect_db(read_only)
+        db.set_trace_callback(statements.append) # Receives each statement with its parameters inlined
+        return db
+    database.connect_db = traced_connect_db
+
+    client = load_app(db_path).test_client()
+    server_errors = []
+    client_open = client.open
+    def checked_open(*args, **kwargs):
+        response = client_open(*args, **kwargs)
+        if response.status_code >= 500:
+            server_errors.append(f"{response.request.method} {response.request.full_path}: {response.status}")
+        return response
+    client.open = checked_open # get() and post() go through open()
+    exercise_endpoints(client)
+
+    checker = database.connect_db()
+    checker.set_trace_callback(None)
+    failures = []
+    for sql in dict.fromkeys(" ".join(s.split()) for s in statements):
+        if not re.match(r"(WITH|SELECT|UPDATE|DELETE|INSERT)\b", sql, re.IGNORECASE):
+            continue
+        if "'main'." in sql: # FTS5's own bookkeeping on its shadow tables, not issued by app.py
+            continue
+        plan = [row['detail'] for row in checker.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        ctes = {MATERIALIZED.match(detail).group(1) for detail in plan if MATERIALIZED.match(detail)}
+        if not any(allowed.match(sql) for allowed in ALLOWED_FULL_SCANS):
+            if any(FULL_SCAN.match(detail) and FULL_SCAN.match(detail).group(1) not in ctes for detail in plan):
+                failures.append(("FULL SCAN", sql, plan))
+        if ROWID_PAGE.search(sql) and not any(allowed.match(sql) for allowed in ALLOWED_SORTS):
+            if any(detail.startswith("USE TEMP B-TREE") for detail in plan):
+                failures.append(("SORTED PAGE", sql, plan))
+
+    for problem, sql, plan in failures:
+        print(f"{problem}: {sql}")
+        for detail in plan:
+            print(f"    {detail}")
+    for error in server_errors:
+        print(f"SERVER ERROR: {error}")
+    print(f"{len(failures)} of {len(set(statements))} statements do a full table scan or sort a page, "
+          f"{len(server_errors)} requests failed.")
+    return 1 if failures or server_errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# benchmarks/ecom_fixture.py
+#
+# Shared setup for the benchmarks: builds a throwaway e-commerce database and
+# builds backend_ecom_server/app.py's app against it, so the real ecom_data.db is never touched.
+
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend_ecom_server')
+sys.path.insert(0, BACKEND_DIR)
+
+import database
+import mock_data
+
+CATEGORIES = ['Electronics', 'Home & Kitchen', 'Books', 'Clothing', 'Sports', 'Beauty']
+BRANDS = ['TechGen', 'HomeLux', 'PageTurner', 'FashionFlow', 'FitLife', 'GlowUp']
+TEST_USER_ID = "test_user_123"
+
+def make_database(num_products=1000, path=None):
+    """Creates a database with the current schema, num_products products and the test user. Returns its path."""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecom_bench_"), "ecom_data.db")
+    conn = sqlite3.connect(path)
+    with open(os.path.join(BACKEND_DIR, 'schema.sql'), 'r') as f:
+        conn.executescript(f.read())
+    database.migrate_db(conn)
+    with mock_data.bulk_load(conn): # Indexes and the FTS index are built once, after the rows are in
+        mock_data.insert_chunks(
+            conn, "INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((f"prod-{i}", f"Item{i} Gadget Pro", f"Description of item {i}", 10.0 + i % 500,
+              CATEGORIES[i % len(CATEGORIES)], BRANDS[i % len(BRANDS)], 1_000_000, None)
+             for i in range(num_products)),
+            chunk_size=50_000,
+        )
+        conn.execute("INSERT INTO users VALUES (?, ?, ?)", (TEST_USER_ID, "testuser", "password"))
+        conn.execute("INSERT INTO carts VALUES (?, ?)", (str(uuid.uuid4()), TEST_USER_ID))
+        conn.commit()
+    conn.close()
+    return path
+
+def load_app(db_path, warm=False):
+    """Points database.py at db_path and returns a backend app built by app.create_app()."""
+    database.DATABASE = db_path
+    database.close_pools() # Pooled connections from an earlier load_app() still point at the old database
+    from app import create_app
+    return create_app(warm=warm)
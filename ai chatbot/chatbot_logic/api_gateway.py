@@ -1,57 +1,134 @@
-# chatbot_logic/api_gateway.py
-
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from chatbot import SalesChatbot
-from chat_session import ChatSession
-
-app = Flask(__name__)
-CORS(app) # Enable CORS for all routes
-
-chatbot = SalesChatbot(ecom_server_url="http://localhost:5000") # Ensure this matches your e-commerce server port
-
-@app.route('/chat', methods=['POST'])
-def chat():
-    data = request.get_json()
-    user_query = data.get('query')
-    session_id = data.get('session_id')
-    user_id = data.get('user_id') # Passed from frontend if logged in
-
-    if not user_query:
-        return jsonify({"error": "No query provided"}), 400
-
-    # Retrieve or create session
-    session = ChatSession.get_session(session_id)
-    if not session:
-        session = ChatSession(user_id=user_id if user_id else "guest")
-    else:
-        # Update session's user_id if it changes (e.g., after login)
-        if user_id and session.user_id == "guest":
-            session.user_id = user_id
-            session.update_context('user_id', user_id)
-
-    # If login happens on frontend, update chatbot's internal session context
-    if data.get('logged_in_user_id'):
-        session.update_context('logged_in', True)
-        session.update_context('user_id', data['logged_in_user_id'])
-        session.update_context('username', data['logged_in_username']) # Assuming frontend passes this
-
-    response_data = chatbot.process_query(user_query, session)
-    return jsonify(response_data)
-
-@app.route('/session/<session_id>', methods=['GET'])
-def get_session_info(session_id):
-    session = ChatSession.get_session(session_id)
-    if session:
-        return jsonify({
-            "session_id": session.session_id,
-            "user_id": session.user_id,
-            "chat_history": session.chat_history,
-            "context": session.context,
-            "start_time": session.start_time.isoformat()
-        })
-    return jsonify({"error": "Session not found"}), 404
-
-if __name__ == '__main__':
-    print("Running Flask Chatbot API Gateway...")
-    app.run(debug=True, port=5001) # Run on a different port than e-commerce server
\ No newline at end of file
+# chatbot_logic/api_gateway.py
+#
+# The chatbot API gateway (Flask). create_app() builds it; run this file for the debug server, or
+# under a pre-forking WSGI server with the app loaded once in the parent, so the warm-up happens
+# before the fork and every worker starts with the name index and facets loaded:
+#
+#   gunicorn --preload -w 4 -b :5001 'api_gateway:create_app()'
+#
+# Flask is only imported by create_app(), so asgi_gateway.py can use the helpers here without it.
+
+import os
+import time
+_imports_started = time.perf_counter() # For the startup report: how long this module's imports take
+
+from chatbot import SalesChatbot
+from chat_session import ChatSession
+from gateway_metrics import init_metrics, record_startup
+import tracing
+
+IMPORT_SECONDS = time.perf_counter() - _imports_started
+ECOM_SERVER_URL = os.environ.get('ECOM_SERVER_URL', "http://localhost:5000") # Ensure this matches your e-commerce server port
+
+def session_for_request(data):
+    """Returns the session a /chat request belongs to, creating it and applying login details as needed."""
+    session_id = data.get('session_id')
+    user_id = data.get('user_id') # Passed from frontend if logged in
+
+    # Retrieve or create session
+    session = ChatSession.get_session(session_id)
+    if not session:
+        session = ChatSession(user_id=user_id if user_id else "guest")
+    else:
+        # Update session's user_id if it changes (e.g., after login)
+        if user_id and session.user_id == "guest":
+            session.user_id = user_id
+            session.update_context('user_id', user_id)
+
+    # If login happens on frontend, update chatbot's internal session context
+    if data.get('logged_in_user_id'):
+        session.update_context('logged_in', True)
+        session.update_context('user_id', data['logged_in_user_id'])
+        session.update_context('username', data['logged_in_username']) # Assuming frontend passes this
+    return session
+
+def wants_timing(headers):
+    """True when the client asked for the turn's timing tree (X-Debug-Timing: 1)."""
+    return headers.get('X-Debug-Timing', '').lower() in ('1', 'true')
+
+def describe_session(session):
+    return {
+        "session_id": session.session_id,
+        "user_id": session.user_id,
+        "chat_history": session.chat_history,
+        "context": session.context,
+        "start_time": session.start_time.isoformat()
+    }
+
+def create_app(chatbot=None, warm=True):
+    """
+    Builds the gateway app around chatbot (by default a new SalesChatbot for ECOM_SERVER_URL), kept
+    as app.chatbot. With warm=True the chatbot is warmed up first (SalesChatbot.warm_up). Reports
+    how long each step took.
+    """
+    started = time.perf_counter()
+    from flask import Flask, request, jsonify # Here rather than at the top; see the header
+    from flask_cors import CORS
+
+    app = Flask(__name__)
+    CORS(app) # Enable CORS for all routes
+
+    if chatbot is None:
+        chatbot = SalesChatbot(ecom_server_url=ECOM_SERVER_URL)
+    app.chatbot = chatbot
+    init_metrics(app, chatbot, ChatSession.session_store) # Request timing and gateway stats, served at /metrics
+
+    @app.route('/chat', methods=['POST'])
+    def chat():
+        data = request.get_json()
+        user_query = data.get('query')
+
+        if not user_query:
+            return jsonify({"error": "No query provided"}), 400
+
+        debug = wants_timing(request.headers)
+        with tracing.start_trace("chat", request.headers.get('X-Trace-ID'), debug) as trace:
+            with tracing.span("load_session"):
+                session = session_for_request(data)
+            response_data = chatbot.process_query(user_query, session)
+            with tracing.span("save_session"):
+                session.save() # Persist history and context changes made while answering
+        timing = tracing.finish_trace(trace)
+        if debug:
+            response_data["timing"] = timing
+        response = jsonify(response_data)
+        if trace.trace_id:
+            response.headers['X-Trace-ID'] = trace.trace_id
+        return response
+
+    @app.route('/session/<session_id>', methods=['GET'])
+    def get_session_info(session_id):
+        session = ChatSession.get_session(session_id)
+        if session:
+            return jsonify(describe_session(session))
+        return jsonify({"error": "Session not found"}), 404
+
+    @app.route('/stats/ecom_api', methods=['GET'])
+    def ecom_api_stats():
+        # Latency counters for the gateway's calls to the e-commerce server, per endpoint
+        return jsonify(chatbot.get_api_stats())
+
+    @app.route('/stats/product_cache', methods=['GET'])
+    def product_cache_stats():
+        # Hit rate and size of the gateway's product cache
+        return jsonify(chatbot.product_cache.stats())
+
+    @app.route('/stats/name_index', methods=['GET'])
+    def name_index_stats():
+        # Size and sync position of the local product name index, and how often it was sure enough to answer
+        return jsonify(chatbot.name_index.stats())
+
+    @app.route('/stats/sessions', methods=['GET'])
+    def session_store_stats():
+        # Size, hit rate and eviction counts of the session store
+        return jsonify(ChatSession.session_store().stats())
+
+    built = time.perf_counter()
+    if warm:
+        chatbot.warm_up()
+    record_startup({"import": IMPORT_SECONDS, "setup": built - started, "warm_up": time.perf_counter() - built})
+    return app
+
+if __name__ == '__main__':
+    print("Running Flask Chatbot API Gateway...")
+    create_app().run(debug=True, port=int(os.environ.get('PORT', 5001))) # Run on a different port than e-commerce server
@@ -0,0 +1,183 @@
+# chatbot_logic/asgi_gateway.py
+#
+# Async (ASGI) mode of the chatbot API gateway. Same routes and responses as api_gateway.py, but
+# /chat awaits SalesChatbot.aprocess_query, so a chat waiting on the e-commerce server holds a
+# coroutine instead of a worker thread and one process can keep thousands of chats in flight.
+# create_app() builds it, without importing Flask. Run it with any ASGI server, e.g.:
+#
+#   uvicorn --factory asgi_gateway:create_app --port 5001
+#
+# or pre-forked, warmed up once in the parent:
+#
+#   gunicorn --preload -w 4 -k uvicorn.workers.UvicornWorker -b :5001 'asgi_gateway:create_app()'
+
+import time
+_imports_started = time.perf_counter() # For the startup report: how long this module's imports take
+
+import asyncio
+import json
+import re
+from api_gateway import ECOM_SERVER_URL, describe_session, session_for_request, wants_timing
+from chatbot import SalesChatbot
+from chat_session import ChatSession
+from gateway_metrics import REQUEST_SECONDS, record_startup, register_collector, render as render_metrics
+import tracing
+
+IMPORT_SECONDS = time.perf_counter() - _imports_started
+
+SESSION_ROUTE = re.compile(r"/session/([^/]+)")
+PLAIN_ROUTES = {"/chat", "/stats/ecom_api", "/stats/product_cache", "/stats/name_index", "/stats/sessions", "/metrics"}
+CORS_HEADERS = [(b"access-control-allow-origin", b"*")] # Same as CORS(app) in api_gateway.py
+
+async def read_json(receive):
+    """Reads the whole request body and parses it as JSON. Returns None if it isn't valid JSON."""
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+async def send_body(send, body, content_type, status=200, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+                   + CORS_HEADERS + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def send_json(send, payload, status=200, headers=()):
+    await send_body(send, json.dumps(payload).encode(), "application/json", status, headers)
+
+async def send_preflight(scope, send):
+    requested_headers = dict(scope["headers"]).get(b"access-control-request-headers", b"")
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": CORS_HEADERS + [
+            (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+            (b"access-control-allow-headers", requested_headers),
+            (b"content-length", b"0"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": b""})
+
+async def off_loop_if_blocking(function, *args):
+    """
+    Runs a session store call in a worker thread when the store blocks (SQLiteSessionStore), so a
+    slow disk doesn't stall every chat on the event loop. In-memory stores are called directly.
+    """
+    if ChatSession.session_store().blocking:
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+async def chat(chatbot, scope, receive, send):
+    data = await read_json(receive)
+    if not isinstance(data, dict):
+        await send_json(send, {"error": "Invalid JSON body"}, 400)
+        return
+    user_query = data.get('query')
+    if not user_query:
+        await send_json(send, {"error": "No query provided"}, 400)
+        return
+
+    request_headers = {name.decode('latin-1').title(): value.decode('latin-1') for name, value in scope["headers"]}
+    debug = wants_timing(request_headers)
+    with tracing.start_trace("chat", request_headers.get('X-Trace-Id'), debug) as trace:
+        with tracing.span("load_session"):
+            session = await off_loop_if_blocking(session_for_request, data)
+        response_data = await chatbot.aprocess_query(user_query, session)
+        with tracing.span("save_session"):
+            await off_loop_if_blocking(session.save) # Persist history and context changes made while answering
+    timing = tracing.finish_trace(trace)
+    if debug:
+        response_data["timing"] = timing
+    await send_json(send, response_data, headers=[(b"x-trace-id", trace.trace_id.encode())] if trace.trace_id else ())
+
+async def lifespan(chatbot, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await chatbot.aclose() # The async client belongs to this loop
+            chatbot.log_shipper.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+def route_label(path):
+    """The api_gateway.py rule a path matches, so metric labels are the same in both modes."""
+    if path in PLAIN_ROUTES:
+        return path
+    return "/session/<session_id>" if SESSION_ROUTE.fullmatch(path) else "unmatched"
+
+def create_app(chatbot=None, warm=True):
+    """
+    Builds the ASGI app around chatbot (by default a new SalesChatbot for ECOM_SERVER_URL), kept as
+    app.chatbot. With warm=True the chatbot is warmed up first (SalesChatbot.warm_up). Reports how
+    long each step took.
+    """
+    started = time.perf_counter()
+    if chatbot is None:
+        chatbot = SalesChatbot(ecom_server_url=ECOM_SERVER_URL)
+    # Chat logs are submitted on the event loop: with the queue full, drop them (counted at /metrics)
+    # rather than stall every chat while waiting for room
+    chatbot.log_shipper.submit_timeout = 0
+    register_collector(chatbot, ChatSession.session_store) # Gateway stats, served at /metrics
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await lifespan(chatbot, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500 # Unless a response gets started
+
+        async def send_and_note_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await dispatch(chatbot, scope, receive, send_and_note_status)
+        finally:
+            REQUEST_SECONDS.labels(scope["method"], route_label(scope["path"]), str(status)).observe(time.perf_counter() - start)
+
+    app.chatbot = chatbot
+    built = time.perf_counter()
+    if warm:
+        chatbot.warm_up()
+    record_startup({"import": IMPORT_SECONDS, "setup": built - started, "warm_up": time.perf_counter() - built})
+    return app
+
+async def dispatch(chatbot, scope, receive, send):
+    path, method = scope["path"], scope["method"]
+
+    if method == "OPTIONS":
+        await send_preflight(scope, send)
+    elif path == "/chat" and method == "POST":
+        await chat(chatbot, scope, receive, send)
+    elif SESSION_ROUTE.fullmatch(path) and method == "GET":
+        session = await off_loop_if_blocking(ChatSession.get_session, SESSION_ROUTE.fullmatch(path).group(1))
+        if session:
+            await send_json(send, describe_session(session))
+        else:
+            await send_json(send, {"error": "Session not found"}, 404)
+    elif path == "/stats/ecom_api" and method == "GET":
+        await send_json(send, chatbot.get_api_stats())
+    elif path == "/stats/product_cache" and method == "GET":
+        await send_json(send, chatbot.product_cache.stats())
+    elif path == "/stats/name_index" and method == "GET":
+        await send_json(send, chatbot.name_index.stats())
+    elif path == "/stats/sessions" and method == "GET":
+        await send_json(send, await off_loop_if_blocking(ChatSession.session_store().stats))
+    elif path == "/metrics" and method == "GET":
+        body, content_type = render_metrics()
+        await send_body(send, body, content_type)
+    else:
+        await send_json(send, {"error": "Not found"}, 404)
@@ -0,0 +1,112 @@
+# chatbot_logic/chat_log_shipper.py
+
+import atexit
+import os
+import queue
+import threading
+import time
+import requests
+
+class ChatLogShipper:
+    """
+    Ships chat log entries to the e-commerce server in the background.
+    Entries are queued by submit() and a worker thread posts them to /chat_logs/batch
+    whenever batch_size entries are waiting or flush_interval seconds have passed,
+    so logging never adds a round-trip to the reply path. The worker starts with the first
+    submit(), so a gateway built before a pre-forking server forks starts one in each worker.
+    """
+
+    def __init__(self, ecom_server_url="http://localhost:5000", batch_size=50, flush_interval=1.0,
+                 max_queue_size=10000, submit_timeout=0.05):
+        self.batch_url = f"{ecom_server_url}/chat_logs/batch"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout # How long submit() may block when the queue is full; 0 never blocks
+        self._queue = queue.Queue(maxsize=max_queue_size) # Bounded, so a slow server can't grow memory forever
+        self._http = requests.Session() # Keep-alive between batches
+        self._stop = threading.Event()
+        self.dropped = 0 # Entries discarded because the queue stayed full
+        self.shipped = 0
+        self._worker = None
+        self._pid = None # Process the worker runs in; a forked child starts its own
+        self._start_lock = threading.Lock()
+        atexit.register(self.close) # Flush whatever is still queued when the process exits
+
+    def submit(self, session_id, sender, message, timestamp=None):
+        """Queues one log entry. Blocks for at most submit_timeout if the queue is full, then drops it."""
+        self._start()
+        entry = {"session_id": session_id, "sender": sender, "message": message, "timestamp": timestamp}
+        try:
+            if self.submit_timeout > 0:
+                self._queue.put(entry, timeout=self.submit_timeout)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                if self._pid is not None: # Forked after starting: the queued entries and connections are the parent's
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                    self._http = requests.Session()
+                self._worker = threading.Thread(target=self._run, name="chat-log-shipper", daemon=True)
+                self._worker.start()
+                self._pid = os.getpid()
+
+    def _take_batch(self, first_entry):
+        """Collects up to batch_size entries, waiting no longer than flush_interval after the first one."""
+        batch = [first_entry]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch):
+        try:
+            response = self._http.post(self.batch_url, json={"logs": batch}, timeout=5)
+            response.raise_for_status()
+            self.shipped += len(batch)
+        except requests.exceptions.RequestException as e:
+            print(f"Error shipping {len(batch)} chat logs to {self.batch_url}: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first_entry = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._send(self._take_batch(first_entry))
+
+    def _drain(self):
+        """Sends everything still in the queue, batch_size at a time."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._send(batch)
+                batch = []
+        if batch:
+            self._send(batch)
+
+    def close(self, timeout=5.0):
+        """Stops the worker and flushes any queued entries. Safe to call more than once."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._pid != os.getpid():
+            return # Nothing was submitted in this process
+        self._worker.join(timeout)
+        self._drain()
+        self._http.close()
@@ -1,59 +1,141 @@
-# chatbot_logic/chat_session.py
-
-import uuid
-import datetime
-
-class ChatSession:
-    """Manages the state and history for a single user's chat session."""
-    _sessions = {} # A dictionary to store all active sessions (in a real app, this would be a database)
-
-    def __init__(self, user_id="guest"):
-        self.session_id = str(uuid.uuid4()) # Unique ID for this chat session
-        self.user_id = user_id # Link to a user (can be 'guest' or a logged-in user ID)
-        self.chat_history = [] # List to store messages: [{"sender": "user/chatbot", "message": "text", "timestamp": "..."}]
-        self.context = { # Stores relevant information for the conversation
-            "last_searched_products": [], # List of products from the last search
-            "last_viewed_product_id": None,
-            "current_flow": None, # e.g., "search_flow", "checkout_flow"
-            "logged_in": False,
-            "username": None,
-            "session_token": None # Token received from e-commerce server
-        }
-        self.start_time = datetime.datetime.now() # When the session started
-        ChatSession._sessions[self.session_id] = self # Add to active sessions
-
-    @classmethod
-    def get_session(cls, session_id):
-        """Retrieves an existing session by ID."""
-        return cls._sessions.get(session_id)
-
-    def add_message(self, sender, message):
-        """Adds a message to the chat history."""
-        log_entry = {
-            "sender": sender,
-            "message": message,
-            "timestamp": datetime.datetime.now().isoformat()
-        }
-        self.chat_history.append(log_entry)
-        return log_entry # Return for logging to backend
-
-    def reset_session(self):
-        """Resets the chat history and context for the current session."""
-        self.chat_history = []
-        self.context = {
-            "last_searched_products": [],
-            "last_viewed_product_id": None,
-            "current_flow": None,
-            "logged_in": False,
-            "username": None,
-            "session_token": None
-        }
-        self.add_message("chatbot", "Conversation has been reset. How can I help you start fresh?")
-
-    def update_context(self, key, value):
-        """Updates a specific context variable."""
-        self.context[key] = value
-
-    def get_context(self, key):
-        """Retrieves a specific context variable."""
-        return self.context.get(key)
\ No newline at end of file
+# chatbot_logic/chat_session.py
+
+import os
+import threading
+import time
+import uuid
+import datetime
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+def _default_store():
+    """SQLite store shared by every worker when CHATBOT_SESSION_DB is set, otherwise in-memory."""
+    idle_ttl = float(os.environ.get('CHATBOT_SESSION_IDLE_TTL', 1800))
+    if os.environ.get('CHATBOT_SESSION_DB'):
+        return SQLiteSessionStore(os.environ['CHATBOT_SESSION_DB'], idle_ttl=idle_ttl)
+    return MemorySessionStore(max_entries=int(os.environ.get('CHATBOT_SESSION_MAX', 10000)), idle_ttl=idle_ttl)
+
+_store_lock = threading.Lock() # Held while ChatSession.session_store() creates the store
+
+class ChatSession:
+    """
+    Manages the state and history for a single user's chat session.
+    Kept small because the gateway holds one per active user: history is a ring buffer of the last
+    HISTORY_SIZE (sender, message, unix time) tuples, context only stores values that differ from
+    CONTEXT_DEFAULTS, and products are referenced by id (the product cache resolves them).
+    """
+    __slots__ = ('session_id', 'user_id', '_history', '_history_next', '_context', 'started_at')
+
+    store = None # Where sessions live between requests (session_store.py); see session_store()
+    HISTORY_SIZE = 50 # Messages kept per session; older ones are overwritten
+    CONTEXT_DEFAULTS = {
+        "last_searched_product_ids": (), # Ids of the products from the last search, in result order
+        "last_viewed_product_id": None,
+        "current_flow": None, # e.g., "search_flow", "checkout_flow"
+        "logged_in": False,
+        "username": None,
+        "session_token": None # Token received from e-commerce server
+    }
+
+    def __init__(self, user_id="guest"):
+        self.session_id = str(uuid.uuid4()) # Unique ID for this chat session
+        self.user_id = user_id # Link to a user (can be 'guest' or a logged-in user ID)
+        self._history = [] # (sender, message, timestamp) tuples; a ring once it holds HISTORY_SIZE
+        self._history_next = 0 # Slot the next message overwrites once the ring is full
+        self._context = None # Context values set so far; created on first update_context()
+        self.started_at = time.time() # When the session started
+        self.save() # Add to active sessions
+
+    @classmethod
+    def session_store(cls):
+        """
+        The session store, created from the environment on first use rather than at import, with
+        its sweeper running in this process (a worker forked after the first use starts its own).
+        """
+        if cls.store is None:
+            with _store_lock:
+                if cls.store is None:
+                    cls.store = _default_store()
+        return cls.store.start_sweeper()
+
+    @classmethod
+    def get_session(cls, session_id):
+        """Retrieves an existing session by ID, or None if it is unknown or has expired."""
+        if not session_id:
+            return None
+        return cls.session_store().load(session_id)
+
+    def save(self):
+        """Writes the session back to the store. Call after changing it so other workers see the change."""
+        ChatSession.session_store().save(self)
+
+    @property
+    def start_time(self):
+        return datetime.datetime.fromtimestamp(self.started_at)
+
+    def _ordered_history(self):
+        return self._history[self._history_next:] + self._history[:self._history_next]
+
+    @property
+    def chat_history(self):
+        """Messages oldest first, as [{"sender": "user/chatbot", "message": "text", "timestamp": "..."}]."""
+        return [{"sender": sender, "message": message, "timestamp": datetime.datetime.fromtimestamp(ts).isoformat()}
+                for sender, message, ts in self._ordered_history()]
+
+    @property
+    def context(self):
+        """The full context, defaults included."""
+        return {**self.CONTEXT_DEFAULTS, **(self._context or {})}
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "history": self._ordered_history(),
+            "context": self._context,
+            "started_at": self.started_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a session saved with to_dict() without registering it again."""
+        session = cls.__new__(cls)
+        session.session_id = data["session_id"]
+        session.user_id = data["user_id"]
+        session._history = [tuple(entry) for entry in data["history"][-cls.HISTORY_SIZE:]]
+        session._history_next = 0
+        session._context = data["context"]
+        session.started_at = data["started_at"]
+        return session
+
+    def add_message(self, sender, message):
+        """Adds a message to the chat history."""
+        entry = (sender, message, time.time())
+        if len(self._history) < self.HISTORY_SIZE:
+            self._history.append(entry)
+        else:
+            self._history[self._history_next] = entry
+            self._history_next = (self._history_next + 1) % self.HISTORY_SIZE
+        return { # Return for logging to backend
+            "sender": sender,
+            "message": message,
+            "timestamp": datetime.datetime.fromtimestamp(entry[2]).isoformat()
+        }
+
+    def reset_session(self):
+        """Resets the chat history and context for the current session."""
+        self._history = []
+        self._history_next = 0
+        self._context = None
+        self.add_message("chatbot", "Conversation has been reset. How can I help you start fresh?")
+
+    def update_context(self, key, value):
+        """Updates a specific context variable."""
+        if self._context is None:
+            self._context = {}
+        self._context[key] = value
+
+    def get_context(self, key):
+        """Retrieves a specific context variable."""
+        if self._context and key in self._context:
+            return self._context[key]
+        return self.CONTEXT_DEFAULTS.get(key)
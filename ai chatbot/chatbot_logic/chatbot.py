@@ -1,363 +1,831 @@
-# chatbot_logic/chatbot.py
-
-import requests
-import json
-import re # Import regex for advanced pattern matching
-from chat_session import ChatSession # Import our session manager
-
-class SalesChatbot:
-    def __init__(self, ecom_server_url="http://localhost:5000"):
-        self.ecom_server_url = ecom_server_url
-
-        # Define keywords for different intents
-        self.greet_keywords = ["hello", "hi", "hey", "hola"]
-        self.goodbye_keywords = ["bye", "goodbye", "exit", "quit", "see ya"]
-        self.thank_keywords = ["thank", "thanks", "thank you"]
-        self.reset_keywords = ["reset", "start over", "clear chat", "new conversation"]
-        self.login_keywords = ["login", "log in", "sign in"]
-        self.view_cart_keywords = ["what's in my cart", "view cart", "show my cart", "my cart", "cart"]
-        self.checkout_keywords = ["checkout", "place order", "pay now", "buy now"]
-        self.product_details_keywords = ["details about", "tell me about", "info on", "describe", "what about"]
-        self.add_to_cart_keywords = ["add to cart", "buy", "add this", "put in cart"]
-        self.remove_from_cart_keywords = ["remove from cart", "delete from cart", "take out of cart", "remove this"]
-        self.product_search_keywords = [
-            "search", "find", "look for", "get me", "show me", "browse",
-            "show", "list", "display", "products", "items", "available"
-        ] # Added more variations for "show products"
-
-    def _extract_price_range(self, query):
-        """Extracts min and max price from query using regex."""
-        entities = {}
-        # Matches "under $XX", "below $XX", "$XX or less"
-        max_price_match = re.search(r'(?:under|below|\$?(\d+)\s*or less)', query)
-        if max_price_match:
-            entities['max_price'] = float(max_price_match.group(1) or (max_price_match.group(2) if max_price_match.group(2) else None)) 
-        
-        # Matches "over $XX", "above $XX", "$XX or more"
-        min_price_match = re.search(r'(?:over|above|\$?(\d+)\s*or more)', query)
-        if min_price_match:
-            entities['min_price'] = float(min_price_match.group(1) or (min_price_match.group(2) if min_price_match.group(2) else None))
-            
-        # Matches "$X to $Y" or "$X and $Y"
-        range_match = re.search(r'\$?(\d+)\s*(?:to|and)\s*\$?(\d+)', query)
-        if range_match:
-            entities['min_price'] = float(range_match.group(1))
-            entities['max_price'] = float(range_match.group(2))
-
-        return entities
-
-    def _recognize_intent_and_entities(self, query, session):
-        """
-        A simplified mock NLU (Natural Language Understanding).
-        In a real scenario, this would be a sophisticated AI model (e.g., using Rasa, Dialogflow).
-        It identifies what the user wants to do (intent) and key information (entities).
-        """
-        lower_query = query.lower()
-        intent = "unknown"
-        entities = {}
-
-        # --- High-Priority Intents ---
-        if any(kw in lower_query for kw in self.goodbye_keywords):
-            intent = "goodbye"
-        elif any(kw in lower_query for kw in self.thank_keywords):
-            intent = "thank"
-        elif any(kw in lower_query for kw in self.reset_keywords):
-            intent = "reset_conversation"
-        elif any(kw in lower_query for kw in self.greet_keywords):
-            intent = "greet"
-        elif any(kw in lower_query for kw in self.login_keywords):
-            intent = "login"
-
-        # --- Cart/Checkout Intents (more specific than general product search) ---
-        elif any(kw in lower_query for kw in self.checkout_keywords):
-            intent = "checkout"
-        elif any(kw in lower_query for kw in self.view_cart_keywords):
-            intent = "view_cart"
-        elif any(kw in lower_query for kw in self.remove_from_cart_keywords):
-            intent = "remove_from_cart"
-            # Extract product name for removal
-            for kw in self.remove_from_cart_keywords:
-                if kw in lower_query:
-                    parts = lower_query.split(kw, 1)
-                    if len(parts) > 1:
-                        product_name = parts[1].strip().replace("from cart", "").strip()
-                        if product_name:
-                            entities['product_name'] = product_name
-                            break
-            # Fallback to last viewed/searched if no name
-            if not entities.get('product_name') and session.get_context('last_viewed_product_id'):
-                entities['product_id'] = session.get_context('last_viewed_product_id')
-
-
-        elif any(kw in lower_query for kw in self.add_to_cart_keywords):
-            intent = "add_to_cart"
-            # Extract product name for adding
-            for kw in self.add_to_cart_keywords:
-                if kw in lower_query:
-                    parts = lower_query.split(kw, 1)
-                    if len(parts) > 1:
-                        product_name = parts[0].replace("add ", "").strip() if "add " in parts[0] else parts[1].strip()
-                        if product_name:
-                            entities['product_name'] = product_name
-                            break
-            # Fallback to last viewed/searched
-            if not entities.get('product_name') and session.get_context('last_viewed_product_id'):
-                entities['product_id'] = session.get_context('last_viewed_product_id')
-            elif not entities.get('product_name') and session.get_context('last_searched_products'):
-                # Default to first searched product if no other info
-                entities['product_id'] = session.get_context('last_searched_products')[0]['id']
-
-
-        # --- Product Details (more specific than general search) ---
-        elif any(kw in lower_query for kw in self.product_details_keywords):
-            intent = "product_details"
-            for kw in self.product_details_keywords:
-                if kw in lower_query:
-                    parts = lower_query.split(kw, 1)
-                    if len(parts) > 1:
-                        entities['product_name'] = parts[1].strip()
-                        break
-            # Fallback to last viewed/searched if no name
-            if not entities.get('product_name'):
-                if session.get_context('last_viewed_product_id'):
-                    entities['product_id'] = session.get_context('last_viewed_product_id')
-                elif session.get_context('last_searched_products'):
-                    entities['product_id'] = session.get_context('last_searched_products')[0]['id'] # First product
-
-        # --- Product Search / Browse (more general) ---
-        # This condition is broader and comes after more specific ones
-        elif any(kw in lower_query for kw in self.product_search_keywords):
-            intent = "search_product"
-            # Extract product name
-            product_name_patterns = [
-                r'search for (.+)', r'look for (.+)', r'find (.+)', r'show me (.+)', r'browse (.+)',
-                r'what (?:are|do you have) (?:about|on)? (.+)', r'get me (.+)'
-            ]
-            for pattern in product_name_patterns:
-                match = re.search(pattern, lower_query)
-                if match:
-                    entities['product_name'] = match.group(1).strip()
-                    break
-            # If no specific product name, but just general "show products"
-            if not entities.get('product_name') and any(kw in lower_query for kw in ["products", "items"]):
-                entities['product_name'] = "" # Indicate general product search
-
-            # Basic entity extraction for category/brand
-            category_match = re.search(r'category\s*(\w+)', lower_query)
-            if category_match:
-                entities['category'] = category_match.group(1)
-            brand_match = re.search(r'brand\s*(\w+)', lower_query)
-            if brand_match:
-                entities['brand'] = brand_match.group(1)
-
-            # Price extraction
-            entities.update(self._extract_price_range(lower_query))
-
-
-        return intent, entities
-
-    def _call_ecom_api(self, endpoint, method="GET", data=None, session_id=None):
-        """Helper to call the e-commerce server API."""
-        url = f"{self.ecom_server_url}/{endpoint}"
-        headers = {}
-        if session_id:
-            # In a real app, this would be a secure token
-            headers['X-Session-ID'] = session_id
-
-        try:
-            if method == "GET":
-                response = requests.get(url, params=data, headers=headers)
-            elif method == "POST":
-                response = requests.post(url, json=data, headers=headers)
-            elif method == "PUT":
-                response = requests.put(url, json=data, headers=headers)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers)
-            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error communicating with e-commerce server {url}: {e}")
-            return {"error": f"Could not connect to the e-commerce service: {e}"}
-
-    def process_query(self, query, session: ChatSession):
-        """Processes a user query and returns a chatbot response."""
-        # Convert the incoming query to lowercase for consistent checks within this function
-        lower_input = query.lower() # THIS IS THE CRUCIAL LINE ADDED/MODIFIED
-
-        intent, entities = self._recognize_intent_and_entities(query, session)
-        response_text = "I'm not sure how to help with that. Can you rephrase or ask about products, cart, or checkout?"
-        product_display_data = [] # To hold product cards for display in UI
-
-        # Log user message
-        session.add_message("user", query)
-        self._call_ecom_api("chat_logs", method="POST", data={
-            "session_id": session.session_id, "sender": "user", "message": query
-        })
-
-        user_id = session.get_context('user_id') # Get current logged in user_id
-
-        # --- Intent Handling ---
-        if intent == "greet":
-            response_text = "Hello! I'm your shopping assistant. How can I help you today?"
-        elif intent == "thank":
-            response_text = "You're welcome! Let me know if you need anything else."
-        elif intent == "goodbye":
-            response_text = "Goodbye! Happy shopping!"
-        elif intent == "reset_conversation":
-            session.reset_session()
-            response_text = "Okay, I've reset our conversation. What would you like to do now?"
-
-        elif intent == "login":
-            if session.get_context('logged_in'):
-                response_text = f"You are already logged in as {session.get_context('username')}."
-            else:
-                response_text = "To log in, please use the login form on the page. For this demo, we assume 'testuser' and 'password'."
-
-        elif intent == "search_product":
-            product_name = entities.get('product_name', '')
-            category = entities.get('category', '')
-            brand = entities.get('brand', '')
-            min_price = entities.get('min_price')
-            max_price = entities.get('max_price')
-
-            search_params = {}
-            if product_name: search_params['query'] = product_name # Changed 'q' to 'query' for consistency with backend
-            if category: search_params['category'] = category
-            if brand: search_params['brand'] = brand
-            if min_price is not None: search_params['min_price'] = min_price
-            if max_price is not None: search_params['max_price'] = max_price
-
-            # If no specific search term, but general intent to show products
-            # This is where the 'lower_query' error occurred in your previous code.
-            # It's now corrected to use 'lower_input'.
-            if not search_params and (any(kw in lower_input for kw in ["products", "items"])): # Corrected variable name
-                response_text = "Here are some general products:"
-                data = self._call_ecom_api("products", method="GET") # Get all products if no specific query
-            elif not search_params: # If search intent but no entities extracted
-                response_text = "What product are you looking for? You can search by name, category, brand, or price range."
-                data = None # No search to perform yet
-            else: # Perform search with extracted parameters
-                data = self._call_ecom_api("products", method="GET", data=search_params)
-
-            if data and not data.get('error'):
-                products = data.get('products', [])
-                if products:
-                    if not product_name and not category and not brand and min_price is None and max_price is None:
-                        response_text = "Here are some products from our catalog:" # More general message if no specific query
-                    else:
-                        response_text = f"Here are some results for {product_name or category or brand or 'your search'}:"
-                    product_display_data = products
-                    session.update_context('last_searched_products', products)
-                    session.update_context('last_viewed_product_id', products[0]['id'] if products else None)
-                else:
-                    response_text = f"Sorry, I couldn't find any products matching your criteria."
-            elif data: # If there was an error from the API call
-                response_text = data.get('error', 'An error occurred while searching for products.')
-
-
-        elif intent == "product_details":
-            product_id = entities.get('product_id')
-            product_name = entities.get('product_name')
-
-            target_product = None
-            if product_id:
-                target_product = self._call_ecom_api(f"products/{product_id}")
-            elif product_name:
-                search_data = self._call_ecom_api("products", method="GET", data={"query": product_name}) # Use 'query'
-                if search_data and not search_data.get('error') and search_data.get('products'):
-                    target_product = search_data['products'][0] # Take the first match
-
-            if target_product and not target_product.get('error'):
-                session.update_context('last_viewed_product_id', target_product['id'])
-                response_text = (f"**{target_product['name']}**\n"
-                                 f"Description: {target_product['description']}\n"
-                                 f"Price: ${target_product['price']:.2f}\n"
-                                 f"Category: {target_product['category']}\n"
-                                 f"Brand: {target_product['brand']}\n"
-                                 f"In Stock: {target_product['stock']} units")
-                product_display_data = [target_product] # Display this specific product
-            else:
-                response_text = f"Sorry, I couldn't find details for that product."
-
-        elif intent == "add_to_cart":
-            if not user_id:
-                response_text = "Please log in first to add items to your cart."
-            else:
-                product_id_to_add = entities.get('product_id')
-                product_name_from_entities = entities.get('product_name')
-
-                if not product_id_to_add and product_name_from_entities:
-                    search_data = self._call_ecom_api("products", method="GET", data={"query": product_name_from_entities}) # Use 'query'
-                    if search_data and not search_data.get('error') and search_data.get('products'):
-                        product_id_to_add = search_data['products'][0]['id'] # Take the first match
-
-                if product_id_to_add:
-                    quantity = 1 # Default quantity
-                    add_response = self._call_ecom_api("cart/add", method="POST",
-                                                         data={"user_id": user_id, "product_id": product_id_to_add, "quantity": quantity})
-                    if add_response and not add_response.get('error'):
-                        response_text = f"{add_response['message']}"
-                    else:
-                        response_text = add_response.get('error', 'Failed to add product to cart.')
-                else:
-                    response_text = "Which product would you like to add to your cart? Please specify a name or ID."
-
-        elif intent == "remove_from_cart":
-            if not user_id:
-                response_text = "Please log in first to modify your cart."
-            else:
-                product_id_to_remove = entities.get('product_id')
-                product_name_from_entities = entities.get('product_name')
-
-                if not product_id_to_remove and product_name_from_entities:
-                    search_data = self._call_ecom_api("products", method="GET", data={"query": product_name_from_entities}) # Use 'query'
-                    if search_data and not search_data.get('error') and search_data.get('products'):
-                        product_id_to_remove = search_data['products'][0]['id']
-
-                if product_id_to_remove:
-                    remove_response = self._call_ecom_api("cart/remove", method="POST",
-                                                             data={"user_id": user_id, "product_id": product_id_to_remove})
-                    if remove_response and not remove_response.get('error'):
-                        response_text = f"{remove_response['message']}"
-                    else:
-                        response_text = remove_response.get('error', 'Failed to remove product from cart.')
-                else:
-                    response_text = "Which product would you like to remove from your cart? Please specify a name or ID."
-
-        elif intent == "view_cart":
-            if not user_id:
-                response_text = "Please log in first to view your cart."
-            else:
-                cart_data = self._call_ecom_api(f"cart/{user_id}")
-                if cart_data and not cart_data.get('error'):
-                    items = cart_data.get('items', [])
-                    if items:
-                        response_text = "Here's what's in your cart:\n"
-                        for item in items:
-                            response_text += f"- {item['name']} (x{item['quantity']}) - ${item['price'] * item['quantity']:.2f}\n"
-                        response_text += f"Total: ${cart_data['total_price']:.2f}"
-                        product_display_data = items # Display cart items as product cards
-                    else:
-                        response_text = "Your cart is empty."
-                else:
-                    response_text = cart_data.get('error', 'An error occurred while viewing your cart.')
-
-        elif intent == "checkout":
-            if not user_id:
-                response_text = "Please log in first to checkout."
-            else:
-                checkout_response = self._call_ecom_api("checkout", method="POST", data={"user_id": user_id})
-                if checkout_response and not checkout_response.get('error'):
-                    response_text = (f"Thank you for your purchase! {checkout_response['message']}. "
-                                     f"Your Order ID is: {checkout_response['order_id']}. "
-                                     f"Total amount: ${checkout_response['total_amount']:.2f}")
-                else:
-                    response_text = checkout_response.get('error', 'Failed to process checkout. Your cart might be empty or an error occurred.')
-
-        # Log chatbot message
-        session.add_message("chatbot", response_text)
-        self._call_ecom_api("chat_logs", method="POST", data={
-            "session_id": session.session_id, "sender": "chatbot", "message": response_text
-        })
-
+# chatbot_logic/chatbot.py
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import namedtuple
+import json
+import re # Import regex for advanced pattern matching
+import threading
+import time
+import tracing
+from chat_session import ChatSession # Import our session manager
+from chat_log_shipper import ChatLogShipper # Sends chat logs to the server in the background
+from product_cache import ProductCache
+from name_index import ProductNameIndex
+from facet_matcher import FacetMatcher
+
+# One call to the e-commerce server, as yielded by the SalesChatbot._handle_query steps; a step
+# may also yield a list of them, which the async gateway runs concurrently (and the sync one in turn).
+# The fields are _call_ecom_api's arguments.
+ApiCall = namedtuple('ApiCall', ['endpoint', 'method', 'data', 'session_id', 'route', 'timeout'],
+                     defaults=["GET", None, None, None, None])
+
+class SalesChatbot:
+    RETRY_STATUSES = (502, 503, 504)
+    RETRY_METHODS = frozenset(["GET", "HEAD", "PUT", "DELETE"]) # Idempotent only: never replay a cart add or checkout
+
+    def __init__(self, ecom_server_url="http://localhost:5000", pool_size=10, connect_timeout=2.0,
+                 read_timeout=10.0, max_retries=2, async_pool_size=100, accept_encoding="identity"):
+        self.ecom_server_url = ecom_server_url
+        self.search_page_size = 10 # Products shown (and remembered) per search reply
+        self.log_shipper = ChatLogShipper(ecom_server_url)
+        self.product_cache = ProductCache()
+        self.version_check_interval = 1.0 # Seconds a seen catalog version is trusted before cache reads re-check it
+        self.name_index = ProductNameIndex() # Product names resolved in-process; loaded in the background on first use
+        self.facet_matcher = FacetMatcher() # The catalog's categories and brands, likewise loaded on first use
+
+        # One pooled keep-alive client for every call to the e-commerce server
+        self.timeout = (connect_timeout, read_timeout) # Default per call; a stalled server can't hold a thread forever
+        self.max_retries = max_retries
+        # The server gzips large responses for clients that accept it. Next to the server, compressing costs
+        # both ends more CPU than it saves on the wire; pass "gzip, deflate" when it's across a slow link.
+        self.accept_encoding = accept_encoding
+        self.http = requests.Session()
+        self.http.headers['Accept-Encoding'] = accept_encoding
+        retries = Retry(
+            total=max_retries,
+            backoff_factor=0.1,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=self.RETRY_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        # The async gateway's client (aiohttp), created inside its event loop on first use; see aprocess_query
+        self.async_pool_size = async_pool_size
+        self.ahttp = None
+
+        # Per-endpoint latency counters: {"GET products/<id>": {"calls", "errors", "total_ms", "max_ms"}}
+        self.api_stats = {}
+        self._api_stats_lock = threading.Lock()
+
+        # Define keywords for different intents
+        self.greet_keywords = ["hello", "hi", "hey", "hola"]
+        self.goodbye_keywords = ["bye", "goodbye", "exit", "quit", "see ya"]
+        self.thank_keywords = ["thank", "thanks", "thank you"]
+        self.reset_keywords = ["reset", "start over", "clear chat", "new conversation"]
+        self.login_keywords = ["login", "log in", "sign in"]
+        self.view_cart_keywords = ["what's in my cart", "view cart", "show my cart", "my cart", "cart"]
+        self.checkout_keywords = ["checkout", "place order", "pay now", "buy now"]
+        self.product_details_keywords = ["details about", "tell me about", "info on", "describe", "what about"]
+        self.add_to_cart_keywords = ["add to cart", "buy", "add this", "put in cart"]
+        self.remove_from_cart_keywords = ["remove from cart", "delete from cart", "take out of cart", "remove this"]
+        self.product_search_keywords = [
+            "search", "find", "look for", "get me", "show me", "browse",
+            "show", "list", "display", "products", "items", "available"
+        ] # Added more variations for "show products"
+
+        # Intents in priority order: when a query has keywords for several intents, the first listed wins
+        self.intent_keywords = [
+            # --- High-Priority Intents ---
+            ("goodbye", self.goodbye_keywords),
+            ("thank", self.thank_keywords),
+            ("reset_conversation", self.reset_keywords),
+            ("greet", self.greet_keywords),
+            ("login", self.login_keywords),
+            # --- Cart/Checkout Intents (more specific than general product search) ---
+            ("checkout", self.checkout_keywords),
+            ("view_cart", self.view_cart_keywords),
+            ("remove_from_cart", self.remove_from_cart_keywords),
+            ("add_to_cart", self.add_to_cart_keywords),
+            # --- Product Details, then the broad Product Search / Browse ---
+            ("product_details", self.product_details_keywords),
+            ("search_product", self.product_search_keywords),
+        ]
+        self._keyword_matcher, self._keywords_at = self._compile_keyword_matcher()
+
+        # Entity patterns, compiled once; only product searches read them
+        self.product_name_patterns = [re.compile(pattern) for pattern in (
+            r'search for (.+)', r'look for (.+)', r'find (.+)', r'show me (.+)', r'browse (.+)',
+            r'what (?:are|do you have) (?:about|on)? (.+)', r'get me (.+)'
+        )]
+        self.category_pattern = re.compile(r'\bcategory\s+(\w+)') # Until the facet matcher has loaded
+        self.brand_pattern = re.compile(r'\bbrand\s+(\w+)')
+        # Left at either end of a product name once its category, brand and prices are taken out
+        self.filler_words = frozenset(["a", "an", "any", "some", "all", "the", "products", "items", "stuff", "things",
+                                       "from", "by", "in", "of", "category", "brand", "for"])
+        self.digit_pattern = re.compile(r'\d')
+        self.max_price_pattern = re.compile(r'(?:under|below)\s*\$?(\d+)|\$?(\d+)\s*or less')
+        self.min_price_pattern = re.compile(r'(?:over|above)\s*\$?(\d+)|\$?(\d+)\s*or more')
+        self.price_range_pattern = re.compile(r'\$?(\d+)\s*(?:to|and)\s*\$?(\d+)')
+        self.price_patterns = (self.price_range_pattern, self.max_price_pattern, self.min_price_pattern)
+
+        # Multi-product commands, recognized by their shape before the keyword scan
+        # "add 2 laptop pro and 3 mouse to cart", "buy 1 x desk lamp, 2 x bulbs"
+        self.cart_items_pattern = re.compile(
+            r'^(?:please\s+)?(?:add|buy|put)\s+(\d+\s*(?:x\s+)?[^\d\s].*?)(?:\s+(?:to|in|into)\s+(?:my\s+|the\s+)?cart)?\s*[.!?]*$')
+        self.item_split_pattern = re.compile(r'\s*(?:,\s*(?:and\s+)?|\band\s+|&\s*)(?=\d)') # Only before a quantity
+        self.quantity_item_pattern = re.compile(r'(\d+)\s*(?:x\s+)?([^\d\s].*)') # A name must follow the quantity
+        # "compare laptop pro and gaming laptop", "compare a, b and c", "compare them" (the last search results)
+        self.compare_pattern = re.compile(r'^(?:please\s+)?compare\b\s*(.*?)\s*[.!?]*$')
+        self.compare_split_pattern = re.compile(r'\s*,\s*(?:and\s+)?|\s+(?:and|with|vs\.?|versus|or)\s+')
+        self.compare_reference_pattern = re.compile(r'(?:them|these|those|all|(?:all of )?(?:these|those|the) (?:products|results))?')
+        self.article_pattern = re.compile(r'^(?:the|a|an)\s+')
+        self.max_compare_products = 5
+
+    def _compile_keyword_matcher(self):
+        """
+        Compiles every intent keyword into one regex shaped like a character trie, so each
+        position of the query costs one walk down the trie instead of one comparison per keyword.
+        The trie sits inside a lookahead, so overlapping keywords ("add to cart" and "cart") are all seen.
+        """
+        trie = {}
+        keyword_intents = {} # keyword -> intents that list it
+        for intent, keywords in self.intent_keywords:
+            for kw in keywords:
+                node = trie
+                for char in kw:
+                    node = node.setdefault(char, {})
+                node[''] = True # Marks the end of a keyword
+                keyword_intents.setdefault(kw, []).append(intent)
+
+        # Only the longest keyword at a position is reported, so remember the shorter ones
+        # that start at the same place (e.g. "buy" inside "buy now")
+        keywords_at = {
+            kw: [(intent, prefix) for prefix, intents in keyword_intents.items() if kw.startswith(prefix) for intent in intents]
+            for kw in keyword_intents
+        }
+        return re.compile(f"(?=({self._trie_to_regex(trie)}))"), keywords_at
+
+    @classmethod
+    def _trie_to_regex(cls, node):
+        """Renders a trie node as a regex that prefers the longest keyword."""
+        branches = [re.escape(char) + cls._trie_to_regex(child) for char, child in node.items() if char != '']
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{pattern})?" if '' in node else pattern
+
+    def _scan_keywords(self, lower_query):
+        """Scans the query once. Returns {intent: set of that intent's keywords found in the query}."""
+        hits = {}
+        for longest in set(self._keyword_matcher.findall(lower_query)):
+            for intent, kw in self._keywords_at[longest]:
+                hits.setdefault(intent, set()).add(kw)
+        return hits
+
+    def _extract_price_range(self, query):
+        """Extracts min and max price from query using regex."""
+        entities = {}
+        # Every price pattern needs a number; most queries have none, so skip the three scans
+        if not self.digit_pattern.search(query):
+            return entities
+
+        # Matches "under $XX", "below $XX", "$XX or less"
+        max_price_match = self.max_price_pattern.search(query)
+        if max_price_match:
+            entities['max_price'] = float(max_price_match.group(1) or max_price_match.group(2))
+
+        # Matches "over $XX", "above $XX", "$XX or more"
+        min_price_match = self.min_price_pattern.search(query)
+        if min_price_match:
+            entities['min_price'] = float(min_price_match.group(1) or min_price_match.group(2))
+
+        # Matches "$X to $Y" or "$X and $Y"
+        range_match = self.price_range_pattern.search(query)
+        if range_match:
+            entities['min_price'] = float(range_match.group(1))
+            entities['max_price'] = float(range_match.group(2))
+
+        return entities
+
+    def _recognize_intent_and_entities(self, query, session):
+        """
+        A simplified mock NLU (Natural Language Understanding).
+        In a real scenario, this would be a sophisticated AI model (e.g., using Rasa, Dialogflow).
+        It identifies what the user wants to do (intent) and key information (entities).
+        """
+        lower_query = query.lower()
+        intent = "unknown"
+        entities = {}
+
+        # Multi-product commands first: by keywords, "add 2 X and 3 Y to cart" would read as view_cart
+        items_match = self.cart_items_pattern.match(lower_query)
+        if items_match:
+            parts = [self.quantity_item_pattern.match(part) for part in self.item_split_pattern.split(items_match.group(1))]
+            # A quantity with no name after it ("add 2 tv and 3") isn't a list of items: read it as any other query
+            if all(parts):
+                return "add_to_cart", {"items": [(int(part.group(1)), part.group(2).strip()) for part in parts]}
+        compare_match = self.compare_pattern.match(lower_query)
+        if compare_match:
+            return "compare_products", self._compare_entities(compare_match.group(1), session)
+
+        keyword_hits = self._scan_keywords(lower_query)
+        # The first intent in priority order with any keyword in the query wins
+        for candidate, _ in self.intent_keywords:
+            if candidate in keyword_hits:
+                intent = candidate
+                break
+
+        # Categories and brands the catalog has, anywhere in a search; naming one is a search by itself
+        facets = {}
+        if intent in ("search_product", "unknown"):
+            facets = self.facet_matcher.match(lower_query)
+            if facets and intent == "unknown": # "any techgen headphones?"
+                intent = "search_product"
+
+        # --- Cart/Checkout Intents (more specific than general product search) ---
+        if intent == "remove_from_cart":
+            # Extract product name for removal
+            for kw in self.remove_from_cart_keywords:
+                if kw in keyword_hits[intent]:
+                    parts = lower_query.split(kw, 1)
+                    product_name = parts[1].strip().replace("from cart", "").strip()
+                    if product_name:
+                        entities['product_name'] = product_name
+                        break
+            # Fallback to last viewed/searched if no name
+            if not entities.get('product_name') and session.get_context('last_viewed_product_id'):
+                entities['product_id'] = session.get_context('last_viewed_product_id')
+
+        elif intent == "add_to_cart":
+            # Extract product name for adding
+            for kw in self.add_to_cart_keywords:
+                if kw in keyword_hits[intent]:
+                    parts = lower_query.split(kw, 1)
+                    product_name = parts[0].replace("add ", "").strip() if "add " in parts[0] else parts[1].strip()
+                    if product_name:
+                        entities['product_name'] = product_name
+                        break
+            # Fallback to last viewed/searched
+            if not entities.get('product_name') and session.get_context('last_viewed_product_id'):
+                entities['product_id'] = session.get_context('last_viewed_product_id')
+            elif not entities.get('product_name') and session.get_context('last_searched_product_ids'):
+                # Default to first searched product if no other info
+                entities['product_id'] = session.get_context('last_searched_product_ids')[0]
+
+        # --- Product Details (more specific than general search) ---
+        elif intent == "product_details":
+            for kw in self.product_details_keywords:
+                if kw in keyword_hits[intent]:
+                    entities['product_name'] = lower_query.split(kw, 1)[1].strip()
+                    break
+            # Fallback to last viewed/searched if no name
+            if not entities.get('product_name'):
+                if session.get_context('last_viewed_product_id'):
+                    entities['product_id'] = session.get_context('last_viewed_product_id')
+                elif session.get_context('last_searched_product_ids'):
+                    entities['product_id'] = session.get_context('last_searched_product_ids')[0] # First product
+
+        # --- Product Search / Browse (more general) ---
+        elif intent == "search_product":
+            # Extract product name; patterns are tried in order, not by position
+            for pattern in self.product_name_patterns:
+                match = pattern.search(lower_query)
+                if match:
+                    entities['product_name'] = match.group(1).strip()
+                    break
+            # If no specific product name, but just general "show products"
+            search_hits = keyword_hits.get(intent, ())
+            if not entities.get('product_name') and ("products" in search_hits or "items" in search_hits):
+                entities['product_name'] = "" # Indicate general product search
+
+            # Category/brand: from the catalog's vocabulary, else after the words "category" and "brand"
+            entities.update(facets)
+            clause_patterns = [] # The "category x"/"brand x" clauses found, to take out of the name like facets
+            if 'category' not in facets:
+                category_match = self.category_pattern.search(lower_query)
+                if category_match:
+                    entities['category'] = category_match.group(1)
+                    clause_patterns.append(self.category_pattern)
+            if 'brand' not in facets:
+                brand_match = self.brand_pattern.search(lower_query)
+                if brand_match:
+                    entities['brand'] = brand_match.group(1)
+                    clause_patterns.append(self.brand_pattern)
+
+            # Price extraction
+            entities.update(self._extract_price_range(lower_query))
+
+            # Category, brand and price are filters, not words the product's name has to contain
+            if facets or clause_patterns or 'min_price' in entities or 'max_price' in entities:
+                product_name = entities.get('product_name')
+                if product_name is None and not search_hits: # Recognized by its facets alone: the query names the product
+                    product_name = lower_query
+                if product_name:
+                    entities['product_name'] = self._strip_filters(product_name, facets, clause_patterns)
+
+        return intent, entities
+
+    def _strip_filters(self, product_name, facets, clause_patterns=()):
+        """The product name without its category, brand and price phrases, or the filler words they leave behind."""
+        if self.digit_pattern.search(product_name):
+            for pattern in self.price_patterns:
+                product_name = pattern.sub(' ', product_name)
+        if facets:
+            product_name = self.facet_matcher.remove(product_name)
+        for pattern in clause_patterns: # Literal "category x"/"brand x", whether or not the vocabulary has loaded
+            product_name = pattern.sub(' ', product_name)
+        words = product_name.strip(' ?!.,').split()
+        while words and words[0] in self.filler_words:
+            words.pop(0)
+        while words and words[-1] in self.filler_words:
+            words.pop()
+        return " ".join(words)
+
+    def _compare_entities(self, names_text, session):
+        """Entities for compare_products: the product names given, or else the last search's products."""
+        if self.compare_reference_pattern.fullmatch(names_text):
+            product_ids = session.get_context('last_searched_product_ids')
+            return {"product_ids": list(product_ids[:self.max_compare_products])} if product_ids else {}
+        names = [self.article_pattern.sub('', name) for name in self.compare_split_pattern.split(names_text)]
+        return {"product_names": [name for name in names if name][:self.max_compare_products]}
+
+    def _call_ecom_api(self, endpoint, method="GET", data=None, session_id=None, route=None, timeout=None):
+        """
+        Helper to call the e-commerce server API.
+        route names the endpoint in api_stats when the path carries an id (e.g. "products/<id>").
+        timeout is (connect, read) seconds and defaults to self.timeout.
+        """
+        url = f"{self.ecom_server_url}/{endpoint}"
+        headers = {}
+        if session_id:
+            # In a real app, this would be a secure token
+            headers['X-Session-ID'] = session_id
+        timeout = timeout or self.timeout
+
+        start = time.perf_counter()
+        failed = True
+        with tracing.span("ecom_api", call=f"{method} {route or endpoint}") as span:
+            if span.trace_id:
+                headers['X-Trace-ID'] = span.trace_id # The server answers with its SQL time in Server-Timing
+            try:
+                response = self._http_request(method, url, data, headers, timeout)
+                span.set(status=response.status_code, server_timing=response.headers.get('Server-Timing'))
+                self._observe_catalog_version(response)
+                response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+                failed = False
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                print(f"Error communicating with e-commerce server {url}: {e}")
+                span.set(error=type(e).__name__)
+                return {"error": f"Could not connect to the e-commerce service: {e}"}
+            finally:
+                self._record_api_call(f"{method} {route or endpoint}", (time.perf_counter() - start) * 1000, failed)
+
+    def _http_request(self, method, url, data, headers, timeout):
+        if method == "GET":
+            return self.http.get(url, params=data, headers=headers, timeout=timeout)
+        elif method == "POST":
+            return self.http.post(url, json=data, headers=headers, timeout=timeout)
+        elif method == "PUT":
+            return self.http.put(url, json=data, headers=headers, timeout=timeout)
+        elif method == "DELETE":
+            return self.http.delete(url, headers=headers, timeout=timeout)
+
+    def _async_http(self):
+        """The shared async HTTP client, created on first use inside the running event loop."""
+        if self.ahttp is None:
+            import aiohttp # Only the async gateway needs aiohttp
+            self.ahttp = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.async_pool_size),
+                                               headers={'Accept-Encoding': self.accept_encoding})
+        return self.ahttp
+
+    async def aclose(self):
+        """Closes the async HTTP client. Call from the event loop that used it."""
+        if self.ahttp is not None:
+            await self.ahttp.close()
+            self.ahttp = None
+
+    async def _acall_ecom_api(self, endpoint, method="GET", data=None, session_id=None, route=None, timeout=None):
+        """Async version of _call_ecom_api on the shared aiohttp client, with the same retries, stats and errors."""
+        import asyncio # Like aiohttp, only imported by the async gateway
+        import aiohttp
+        url = f"{self.ecom_server_url}/{endpoint}"
+        headers = {}
+        if session_id:
+            headers['X-Session-ID'] = session_id
+        connect_timeout, read_timeout = timeout or self.timeout
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+
+        start = time.perf_counter()
+        failed = True
+        with tracing.span("ecom_api", call=f"{method} {route or endpoint}") as span:
+            if span.trace_id:
+                headers['X-Trace-ID'] = span.trace_id
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        async with self._async_http().request(
+                                method, url, headers=headers, timeout=timeout,
+                                params=data if method == "GET" else None,
+                                json=data if method in ("POST", "PUT") else None) as response:
+                            retry = (response.status in self.RETRY_STATUSES and method in self.RETRY_METHODS
+                                     and attempt < self.max_retries)
+                            if not retry:
+                                span.set(status=response.status, attempts=attempt + 1,
+                                         server_timing=response.headers.get('Server-Timing'))
+                                self._observe_catalog_version(response)
+                                response.raise_for_status()
+                                result = await response.json()
+                                failed = False
+                                return result
+                    except aiohttp.ClientConnectorError:
+                        if attempt == self.max_retries: # Connecting failed, so nothing was sent and any method may retry
+                            raise
+                    await asyncio.sleep(0.1 * 2 ** attempt) # Same backoff as the sync client's Retry
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                print(f"Error communicating with e-commerce server {url}: {e}")
+                span.set(error=type(e).__name__)
+                return {"error": f"Could not connect to the e-commerce service: {e}"}
+            finally:
+                self._record_api_call(f"{method} {route or endpoint}", (time.perf_counter() - start) * 1000, failed)
+
+    def _observe_catalog_version(self, response):
+        catalog_version = response.headers.get('X-Catalog-Version')
+        if catalog_version is not None:
+            self.product_cache.observe_version(int(catalog_version)) # Drops cached products if the catalog changed
+
+    def _record_api_call(self, key, elapsed_ms, failed):
+        with self._api_stats_lock:
+            stats = self.api_stats.get(key)
+            if stats is None:
+                stats = self.api_stats[key] = {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+            stats["calls"] += 1
+            stats["errors"] += failed
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def get_api_stats(self):
+        """Returns a snapshot of the per-endpoint latency counters, with the mean added."""
+        with self._api_stats_lock:
+            return {
+                key: dict(stats, avg_ms=stats["total_ms"] / stats["calls"])
+                for key, stats in self.api_stats.items()
+            }
+
+    # The helpers below and _handle_query are step generators: they yield an ApiCall (or a list of
+    # independent ApiCalls) and are sent back the response (or list of responses). process_query runs
+    # the calls one by one on the requests session; aprocess_query awaits them, running lists concurrently.
+
+    def _refresh_catalog_version(self):
+        """Re-checks the catalog version with the server if the cache hasn't heard it recently."""
+        if time.monotonic() - self.product_cache.version_seen_at > self.version_check_interval:
+            yield ApiCall("catalog/version") # The X-Catalog-Version header does the rest
+
+    def _get_product(self, product_id):
+        """Returns a product by id, from the cache while the catalog is unchanged."""
+        yield from self._refresh_catalog_version()
+        product = self.product_cache.get(product_id)
+        if product is None:
+            version = self.product_cache.version
+            product = yield ApiCall(f"products/{product_id}", route="products/<id>")
+            if not product.get('error'):
+                self.product_cache.put(product, version)
+        return product
+
+    def _find_product(self, product_name):
+        """Returns the best catalog match for a product name (or None)."""
+        products = yield from self._find_products([product_name])
+        return products[0]
+
+    def _fetch_names(self, since, epoch):
+        """GET /catalog/names for the name index's sync thread; a first snapshot of a big catalog takes a while."""
+        return self._call_ecom_api("catalog/names", data=None if since is None else {"since": since, "epoch": epoch},
+                                   timeout=(self.timeout[0], 60.0))
+
+    def _fetch_facets(self):
+        """GET /products/facets for the facet matcher's loading thread."""
+        return self._call_ecom_api("products/facets")
+
+    def warm_up(self):
+        """
+        Loads the name index and the facet vocabulary now, in this thread, instead of in the background
+        on the first query. The gateway does this before a pre-forking server forks (threads don't
+        survive a fork; what they loaded does), then closes the pooled connections the loads opened,
+        so no two workers share a socket.
+        """
+        self.name_index.sync(self._fetch_names)
+        self.facet_matcher.refresh(self._fetch_facets)
+        self.http.close() # The pools reopen connections on the next call
+
+    def _resolve_name_locally(self, product_name):
+        """The product id the local name index is confident a name means, or None."""
+        self.name_index.start_sync(self._fetch_names) # No-op once started
+        with tracing.span("resolve_name") as span:
+            product_id = self.name_index.best_match(product_name)
+            span.set(local=product_id is not None)
+        return product_id
+
+    def process_query(self, query, session: ChatSession):
+        """Processes a user query and returns a chatbot response."""
+        with tracing.span("process_query"):
+            steps = self._handle_query(query, session)
+            response = None
+            while True:
+                try:
+                    call = steps.send(response)
+                except StopIteration as done:
+                    return done.value
+                if isinstance(call, list):
+                    response = [self._call_ecom_api(*each) for each in call]
+                else:
+                    response = self._call_ecom_api(*call)
+
+    async def aprocess_query(self, query, session: ChatSession):
+        """Async version of process_query for the ASGI gateway; independent backend calls run concurrently."""
+        import asyncio
+        with tracing.span("process_query"):
+            steps = self._handle_query(query, session)
+            response = None
+            while True:
+                try:
+                    call = steps.send(response)
+                except StopIteration as done:
+                    return done.value
+                if isinstance(call, list): # gather copies the context, so each call's span is a child of the current one
+                    response = list(await asyncio.gather(*(self._acall_ecom_api(*each) for each in call)))
+                else:
+                    response = await self._acall_ecom_api(*call)
+
+    def _get_products(self, product_ids):
+        """Returns the products for a list of ids (None where missing), fetching all cache misses in one request."""
+        yield from self._refresh_catalog_version()
+        products = {product_id: self.product_cache.get(product_id) for product_id in product_ids}
+        missing = [product_id for product_id, product in products.items() if product is None]
+        if missing:
+            version = self.product_cache.version
+            data = yield ApiCall("products/batch", data={"ids": ",".join(missing)})
+            for product in data.get('products', []):
+                products[product['id']] = product
+                self.product_cache.put(product, version)
+        return [products[product_id] for product_id in product_ids]
+
+    def _find_products(self, product_names):
+        """
+        Returns the best catalog match for each name (None where nothing matches): from the cache,
+        else by id through the local name index, else from a server-side search. The id lookup for
+        the names the index knows and the search for the rest are one step, so they run together.
+        """
+        yield from self._refresh_catalog_version()
+        products = [self.product_cache.get_by_name(name) for name in product_names]
+        missing = [name for name, product in zip(product_names, products) if product is None]
+        local_ids = {name: self._resolve_name_locally(name) for name in missing}
+        local_ids = {name: product_id for name, product_id in local_ids.items() if product_id}
+        unresolved = [name for name in missing if name not in local_ids]
+        found = {product_id: self.product_cache.get(product_id) for product_id in local_ids.values()}
+        uncached = [product_id for product_id, product in found.items() if product is None]
+
+        version = self.product_cache.version
+        calls = []
+        if uncached:
+            calls.append(ApiCall("products/batch", data={"ids": ",".join(uncached)}))
+        if unresolved:
+            calls.append(ApiCall("products/resolve", data=[("name", name) for name in unresolved]))
+        responses = (yield calls) if calls else []
+        if uncached:
+            for product in responses[0].get('products', []):
+                found[product['id']] = product
+                self.product_cache.put(product, version)
+
+        resolved = {}
+        for name, product_id in local_ids.items():
+            if found.get(product_id):
+                resolved[name] = found[product_id]
+                self.product_cache.put(found[product_id], version, name=name)
+        if unresolved:
+            self._store_resolved(unresolved, responses[-1], version, resolved)
+        stale = [name for name in local_ids if name not in resolved] # Deleted since the index last synced; the server decides
+        if stale:
+            data = yield ApiCall("products/resolve", data=[("name", name) for name in stale])
+            self._store_resolved(stale, data, version, resolved)
+        return [product or resolved.get(name) for name, product in zip(product_names, products)]
+
+    def _store_resolved(self, names, data, version, resolved):
+        """Adds a GET /products/resolve response for names to resolved (and the product cache)."""
+        for name, product in zip(names, data.get('products') or [None] * len(names)):
+            resolved[name] = product
+            if product:
+                self.product_cache.put(product, version, name=name)
+
+    @staticmethod
+    def _join_words(words, conjunction="and"):
+        return ", ".join(words[:-1]) + f" {conjunction} " + words[-1] if len(words) > 1 else words[0]
+
+    def _add_items_to_cart(self, user_id, items):
+        """Adds [(quantity, product name), ...] to the cart: one name lookup, then one all-or-nothing cart update."""
+        products = yield from self._find_products([product_name for _, product_name in items])
+        not_found = [product_name for (_, product_name), product in zip(items, products) if not product]
+        if not_found:
+            return f"Sorry, I couldn't find {self._join_words(not_found, 'or')}. Nothing was added to your cart."
+        add_response = yield ApiCall("cart/add_many", method="POST", data={
+            "user_id": user_id,
+            "items": [{"product_id": product['id'], "quantity": quantity} for (quantity, _), product in zip(items, products)]
+        })
+        return add_response.get('error') or add_response['message']
+
+    def _compare_products(self, entities):
+        """Returns (reply text, products) comparing the products named or referenced in entities."""
+        if entities.get('product_names'):
+            products = yield from self._find_products(entities['product_names'])
+            not_found = [name for name, product in zip(entities['product_names'], products) if not product]
+        elif entities.get('product_ids'):
+            products = yield from self._get_products(entities['product_ids'])
+            not_found = []
+        else:
+            return "Which products would you like to compare? For example: compare Laptop Pro and Gaming Laptop.", []
+
+        found = list({product['id']: product for product in products if product}.values()) # Two names may match one product
+        missing_text = f" I couldn't find {self._join_words(not_found, 'or')}." if not_found else ""
+        if len(found) < 2:
+            return "I need at least two products to compare." + missing_text, found
+        lines = ["Here's how they compare:"]
+        for product in found:
+            lines.append(f"- **{product['name']}**: ${product['price']:.2f}, {product['brand']}, "
+                         f"{product['category']}, {product['stock']} in stock")
+        cheapest = min(found, key=lambda product: product['price'])
+        lines.append(f"Cheapest: {cheapest['name']} at ${cheapest['price']:.2f}." + missing_text)
+        return "\n".join(lines), found
+
+    def _handle_query(self, query, session: ChatSession):
+        """The conversation logic behind process_query/aprocess_query, as a step generator."""
+        # Convert the incoming query to lowercase for consistent checks within this function
+        lower_input = query.lower() # THIS IS THE CRUCIAL LINE ADDED/MODIFIED
+        self.facet_matcher.start_loading(self._fetch_facets) # No-op once started
+
+        with tracing.span("recognize_intent") as span:
+            intent, entities = self._recognize_intent_and_entities(query, session)
+            span.set(intent=intent)
+        response_text = "I'm not sure how to help with that. Can you rephrase or ask about products, cart, or checkout?"
+        product_display_data = [] # To hold product cards for display in UI
+
+        # Log user message
+        with tracing.span("log_message", sender="user"):
+            log_entry = session.add_message("user", query)
+            self.log_shipper.submit(session.session_id, "user", query, log_entry['timestamp'])
+
+        user_id = session.get_context('user_id') # Get current logged in user_id
+
+        # --- Intent Handling ---
+        if intent == "greet":
+            response_text = "Hello! I'm your shopping assistant. How can I help you today?"
+        elif intent == "thank":
+            response_text = "You're welcome! Let me know if you need anything else."
+        elif intent == "goodbye":
+            response_text = "Goodbye! Happy shopping!"
+        elif intent == "reset_conversation":
+            session.reset_session()
+            response_text = "Okay, I've reset our conversation. What would you like to do now?"
+
+        elif intent == "login":
+            if session.get_context('logged_in'):
+                response_text = f"You are already logged in as {session.get_context('username')}."
+            else:
+                response_text = "To log in, please use the login form on the page. For this demo, we assume 'testuser' and 'password'."
+
+        elif intent == "search_product":
+            product_name = entities.get('product_name', '')
+            category = entities.get('category', '')
+            brand = entities.get('brand', '')
+            min_price = entities.get('min_price')
+            max_price = entities.get('max_price')
+
+            search_params = {}
+            if product_name: search_params['query'] = product_name # Changed 'q' to 'query' for consistency with backend
+            if category: search_params['category'] = category
+            if brand: search_params['brand'] = brand
+            if min_price is not None: search_params['min_price'] = min_price
+            if max_price is not None: search_params['max_price'] = max_price
+
+            # If no specific search term, but general intent to show products
+            # This is where the 'lower_query' error occurred in your previous code.
+            # It's now corrected to use 'lower_input'.
+            if not search_params and (any(kw in lower_input for kw in ["products", "items"])): # Corrected variable name
+                response_text = "Here are some general products:"
+                catalog_version = self.product_cache.version
+                data = yield ApiCall("products", method="GET", data={"limit": self.search_page_size}) # First page of the catalog
+            elif not search_params: # If search intent but no entities extracted
+                response_text = "What product are you looking for? You can search by name, category, brand, or price range."
+                data = None # No search to perform yet
+            else: # Perform search with extracted parameters
+                catalog_version = self.product_cache.version
+                data = yield ApiCall("products", method="GET", data=dict(search_params, limit=self.search_page_size))
+
+            if data and not data.get('error'):
+                products = data.get('products', [])
+                if products:
+                    if not product_name and not category and not brand and min_price is None and max_price is None:
+                        response_text = "Here are some products from our catalog:" # More general message if no specific query
+                    else:
+                        response_text = f"Here are some results for {product_name or category or brand or 'your search'}:"
+                    product_display_data = products
+                    for product in products: # Likely next asks are details or add-to-cart for one of these
+                        self.product_cache.put(product, catalog_version)
+                    session.update_context('last_searched_product_ids', tuple(product['id'] for product in products)) # Resolved through the product cache when needed
+                    session.update_context('last_viewed_product_id', products[0]['id'] if products else None)
+                else:
+                    response_text = f"Sorry, I couldn't find any products matching your criteria."
+            elif data: # If there was an error from the API call
+                response_text = data.get('error', 'An error occurred while searching for products.')
+
+
+        elif intent == "product_details":
+            product_id = entities.get('product_id')
+            product_name = entities.get('product_name')
+
+            target_product = None
+            if product_id:
+                target_product = yield from self._get_product(product_id)
+            elif product_name:
+                target_product = yield from self._find_product(product_name)
+
+            if target_product and not target_product.get('error'):
+                session.update_context('last_viewed_product_id', target_product['id'])
+                response_text = (f"**{target_product['name']}**\n"
+                                 f"Description: {target_product['description']}\n"
+                                 f"Price: ${target_product['price']:.2f}\n"
+                                 f"Category: {target_product['category']}\n"
+                                 f"Brand: {target_product['brand']}\n"
+                                 f"In Stock: {target_product['stock']} units")
+                product_display_data = [target_product] # Display this specific product
+            else:
+                response_text = f"Sorry, I couldn't find details for that product."
+
+        elif intent == "add_to_cart":
+            if not user_id:
+                response_text = "Please log in first to add items to your cart."
+            elif entities.get('items'): # "add 2 X and 3 Y": quantities given, possibly several products
+                response_text = yield from self._add_items_to_cart(user_id, entities['items'])
+            else:
+                product_id_to_add = entities.get('product_id')
+                product_name_from_entities = entities.get('product_name')
+
+                if not product_id_to_add and product_name_from_entities:
+                    product = yield from self._find_product(product_name_from_entities)
+                    if product:
+                        product_id_to_add = product['id']
+
+                if product_id_to_add:
+                    quantity = 1 # Default quantity
+                    add_response = yield ApiCall("cart/add", method="POST",
+                                                 data={"user_id": user_id, "product_id": product_id_to_add, "quantity": quantity})
+                    if add_response and not add_response.get('error'):
+                        response_text = f"{add_response['message']}"
+                    else:
+                        response_text = add_response.get('error', 'Failed to add product to cart.')
+                else:
+                    response_text = "Which product would you like to add to your cart? Please specify a name or ID."
+
+        elif intent == "compare_products":
+            response_text, product_display_data = yield from self._compare_products(entities)
+
+        elif intent == "remove_from_cart":
+            if not user_id:
+                response_text = "Please log in first to modify your cart."
+            else:
+                product_id_to_remove = entities.get('product_id')
+                product_name_from_entities = entities.get('product_name')
+
+                if not product_id_to_remove and product_name_from_entities:
+                    product = yield from self._find_product(product_name_from_entities)
+                    if product:
+                        product_id_to_remove = product['id']
+
+                if product_id_to_remove:
+                    remove_response = yield ApiCall("cart/remove", method="POST",
+                                                    data={"user_id": user_id, "product_id": product_id_to_remove})
+                    if remove_response and not remove_response.get('error'):
+                        response_text = f"{remove_response['message']}"
+                    else:
+                        response_text = remove_response.get('error', 'Failed to remove product from cart.')
+                else:
+                    response_text = "Which product would you like to remove from your cart? Please specify a name or ID."
+
+        elif intent == "view_cart":
+            if not user_id:
+                response_text = "Please log in first to view your cart."
+            else:
+                cart_data = yield ApiCall(f"cart/{user_id}", route="cart/<user_id>")
+                if cart_data and not cart_data.get('error'):
+                    items = cart_data.get('items', [])
+                    if items:
+                        response_text = "Here's what's in your cart:\n"
+                        for item in items:
+                            response_text += f"- {item['name']} (x{item['quantity']}) - ${item['price'] * item['quantity']:.2f}\n"
+                        response_text += f"Total: ${cart_data['total_price']:.2f}"
+                        product_display_data = items # Display cart items as product cards
+                    else:
+                        response_text = "Your cart is empty."
+                else:
+                    response_text = cart_data.get('error', 'An error occurred while viewing your cart.')
+
+        elif intent == "checkout":
+            if not user_id:
+                response_text = "Please log in first to checkout."
+            else:
+                checkout_response = yield ApiCall("checkout", method="POST", data={"user_id": user_id})
+                if checkout_response and not checkout_response.get('error'):
+                    response_text = (f"Thank you for your purchase! {checkout_response['message']}. "
+                                     f"Your Order ID is: {checkout_response['order_id']}. "
+                                     f"Total amount: ${checkout_response['total_amount']:.2f}")
+                else:
+                    response_text = checkout_response.get('error', 'Failed to process checkout. Your cart might be empty or an error occurred.')
+
+        # Log chatbot message
+        with tracing.span("log_message", sender="chatbot"):
+            log_entry = session.add_message("chatbot", response_text)
+            self.log_shipper.submit(session.session_id, "chatbot", response_text, log_entry['timestamp'])
+
         return {"text": response_text, "products": product_display_data, "session_id": session.session_id, "user_id": user_id}
\ No newline at end of file
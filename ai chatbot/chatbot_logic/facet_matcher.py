@@ -0,0 +1,103 @@
+# chatbot_logic/facet_matcher.py
+#
+# Recognizes the catalog's categories and brands anywhere in a query ("any techgen headphones?",
+# "home and kitchen stuff under $50"), not only after the words "category" or "brand".
+# The vocabulary comes from GET /products/facets: loaded once in the background, refreshed every
+# refresh_interval seconds for new categories and brands, and compiled into one regex per facet.
+# Until it has loaded, the chatbot falls back to its "category X" / "brand X" patterns.
+
+import re
+import threading
+import time
+
+WORD = re.compile(r'\w+')
+JOINER = r'(?:\s*&\s*|\s+and\s+|[\s-]+)' # "home & kitchen", "home and kitchen", "home-kitchen"
+
+def name_pattern(name, plurals=False):
+    """A regex for one category or brand name; with plurals, its last word may be singular or plural."""
+    words = [re.escape(word) for word in WORD.findall(name.lower())]
+    if not words:
+        return None
+    if plurals:
+        last = words[-1]
+        if last.endswith('s') and not last.endswith('ss') and len(last) > 3:
+            words[-1] = last[:-1] + 's?' # "books" or "book"
+        else:
+            words[-1] = last + '(?:s|es)?'
+    return JOINER.join(words)
+
+def compile_names(names, plurals=False):
+    """
+    Returns (regex, names in group order): one capturing group per name, longest first so
+    "home & kitchen" wins over a "home" that is also in the vocabulary. (None, []) if there are no names.
+    """
+    patterns = [(pattern, name) for name in names for pattern in [name_pattern(name, plurals)] if pattern]
+    if not patterns:
+        return None, []
+    patterns.sort(key=lambda entry: len(entry[0]), reverse=True)
+    regex = re.compile(r'(?<!\w)(?:' + '|'.join(f'({pattern})' for pattern, _ in patterns) + r')(?!\w)')
+    return regex, [name for _, name in patterns]
+
+class FacetMatcher:
+    def __init__(self, refresh_interval=300.0, retry_interval=5.0):
+        self.refresh_interval = refresh_interval # Seconds between vocabulary reloads
+        self.retry_interval = retry_interval # Seconds before trying again while nothing is loaded
+        self.loaded_at = None # time.monotonic() of the last successful load
+        # {facet: (regex, names in group order)}, replaced whole by load() so lookups need no lock
+        self._vocabulary = {}
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def load(self, data):
+        """Compiles a GET /products/facets response."""
+        self._vocabulary = {
+            'category': compile_names([facet['name'] for facet in data['categories']], plurals=True),
+            'brand': compile_names([facet['name'] for facet in data['brands']]),
+        }
+        self.loaded_at = time.monotonic()
+
+    def match(self, lower_query):
+        """{'category': ..., 'brand': ...} for the first of each the query mentions, as the catalog spells it."""
+        found = {}
+        for facet, (regex, names) in self._vocabulary.items():
+            match = regex.search(lower_query) if regex else None
+            if match:
+                found[facet] = names[match.lastindex - 1]
+        return found
+
+    def remove(self, text):
+        """text with every category and brand mention taken out."""
+        for regex, _ in self._vocabulary.values():
+            if regex:
+                text = regex.sub(' ', text)
+        return " ".join(text.split())
+
+    def refresh(self, fetch):
+        """Loads the vocabulary; fetch() calls GET /products/facets. Returns False if it failed."""
+        data = fetch()
+        if not isinstance(data, dict) or data.get('error') or 'categories' not in data:
+            return False
+        self.load(data)
+        return True
+
+    def start_loading(self, fetch):
+        """Loads the vocabulary in a background thread (unless already loaded) and keeps refreshing it."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._refresh_forever, args=(fetch,), name="facet-matcher", daemon=True)
+        self._thread.start()
+
+    def _refresh_forever(self, fetch):
+        if not self.loaded:
+            self.refresh(fetch)
+        while not self._stop.wait(self.refresh_interval if self.loaded else self.retry_interval):
+            self.refresh(fetch)
+
+    def stop(self):
+        self._stop.set()
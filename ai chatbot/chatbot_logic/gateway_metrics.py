@@ -0,0 +1,114 @@
+# chatbot_logic/gateway_metrics.py
+#
+# Prometheus metrics for the chatbot gateway (Flask and ASGI modes): latency per route, plus the
+# counters the gateway already keeps for its e-commerce calls, product cache, session store and
+# chat log shipping, which are only read when /metrics is scraped. chatbot_startup_seconds says how long create_app() took.
+
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, Histogram, generate_latest
+from prometheus_client import GC_COLLECTOR, PLATFORM_COLLECTOR, PROCESS_COLLECTOR
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+registry = CollectorRegistry() # Separate from the e-commerce server's when both run in one process (benchmarks)
+for collector in (PROCESS_COLLECTOR, PLATFORM_COLLECTOR, GC_COLLECTOR):
+    registry.register(collector)
+
+REQUEST_SECONDS = Histogram(
+    'chatbot_request_duration_seconds', "Time to handle a gateway request.",
+    ['method', 'route', 'status'], registry=registry,
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+STARTUP_SECONDS = Gauge(
+    'chatbot_startup_seconds', "Time the gateway took to start, by phase: import, setup and warm_up.", ['phase'],
+    registry=registry,
+)
+_collector = None # The GatewayCollector of the most recently built app
+
+class GatewayCollector:
+    """Turns the stats() of the gateway's API counters, product cache, name index and session store into metrics at scrape time."""
+
+    def __init__(self, chatbot, session_store):
+        self.chatbot = chatbot
+        self.session_store = session_store # A callable, since the store is created on first use and can be swapped
+
+    def collect(self):
+        calls = CounterMetricFamily('chatbot_ecom_api_calls', "Calls to the e-commerce server.", labels=['endpoint'])
+        errors = CounterMetricFamily('chatbot_ecom_api_errors', "Failed calls to the e-commerce server.", labels=['endpoint'])
+        seconds = CounterMetricFamily('chatbot_ecom_api_duration_seconds', "Time spent in calls to the e-commerce server.",
+                                      labels=['endpoint'])
+        for endpoint, stats in self.chatbot.get_api_stats().items():
+            calls.add_metric([endpoint], stats["calls"])
+            errors.add_metric([endpoint], stats["errors"])
+            seconds.add_metric([endpoint], stats["total_ms"] / 1000)
+        yield from (calls, errors, seconds)
+
+        cache = self.chatbot.product_cache.stats()
+        yield GaugeMetricFamily('chatbot_product_cache_entries', "Products in the gateway's cache.", value=cache["entries"])
+        yield CounterMetricFamily('chatbot_product_cache_hits', "Product cache hits.", value=cache["hits"])
+        yield CounterMetricFamily('chatbot_product_cache_misses', "Product cache misses.", value=cache["misses"])
+        yield CounterMetricFamily('chatbot_product_cache_invalidations', "Times the catalog version moved and the cache was cleared.",
+                                  value=cache["invalidations"])
+
+        names = self.chatbot.name_index.stats()
+        yield GaugeMetricFamily('chatbot_name_index_names', "Distinct product names in the local name index.", value=names["names"])
+        lookups = CounterMetricFamily('chatbot_name_index_lookups', "Name lookups by the local index.", labels=['result'])
+        lookups.add_metric(['confident'], names["confident"])
+        lookups.add_metric(['unsure'], names["unsure"]) # Left to the server's full-text search
+        yield lookups
+
+        sessions = self.session_store().stats()
+        yield GaugeMetricFamily('chatbot_sessions', "Chat sessions in the session store.", value=sessions["sessions"])
+        yield CounterMetricFamily('chatbot_session_hits', "Session lookups that found the session.", value=sessions["hits"])
+        yield CounterMetricFamily('chatbot_session_misses', "Session lookups that didn't.", value=sessions["misses"])
+        evicted = CounterMetricFamily('chatbot_sessions_evicted', "Sessions dropped by the store.", labels=['reason'])
+        evicted.add_metric(['idle'], sessions["evicted_idle"])
+        evicted.add_metric(['capacity'], sessions["evicted_capacity"])
+        yield evicted
+
+        shipper = self.chatbot.log_shipper
+        chat_logs = CounterMetricFamily('chatbot_chat_logs', "Chat log entries sent to the e-commerce server, or dropped "
+                                        "because the shipping queue was full.", labels=['result'])
+        chat_logs.add_metric(['shipped'], shipper.shipped)
+        chat_logs.add_metric(['dropped'], shipper.dropped)
+        yield chat_logs
+
+def render():
+    """Returns (body, content type) for a /metrics response."""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def register_collector(chatbot, session_store):
+    """Reports chatbot's and the session store's stats at /metrics, in place of an earlier app's."""
+    global _collector
+    if _collector is not None:
+        registry.unregister(_collector)
+    _collector = GatewayCollector(chatbot, session_store)
+    registry.register(_collector)
+
+def record_startup(phases):
+    """Keeps how long each startup phase took for /metrics, and prints it."""
+    for phase, seconds in phases.items():
+        STARTUP_SECONDS.labels(phase).set(seconds)
+    print("Chatbot gateway started in " + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in phases.items()))
+
+def init_metrics(app, chatbot, session_store):
+    """Registers the stats collector, and the Flask app's timing hooks and /metrics route. asgi_gateway.py times its own requests."""
+    from flask import Response, g, request # Imported here so the ASGI gateway never loads Flask
+    register_collector(chatbot, session_store)
+
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched" # Rule templates keep labels bounded
+            REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(time.perf_counter() - start)
+        return response
+
+    def metrics():
+        body, content_type = render()
+        return Response(body, content_type=content_type)
+
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
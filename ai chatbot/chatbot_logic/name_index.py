@@ -0,0 +1,238 @@
+# chatbot_logic/name_index.py
+#
+# Resolves free-text product names to product ids inside the gateway, so "tell me about <name>"
+# and "add <name> to cart" don't need a full-text search on the e-commerce server.
+# Names are indexed by trigram, each word padded the way pg_trgm does it ("  mat "), which
+# tolerates typos, missing words and word order. The index is loaded from GET /catalog/names and
+# kept current from the same endpoint's change log by a background thread.
+
+import bisect
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from itertools import chain
+
+WORD = re.compile(r'\w+')
+NO_POSTINGS = array('i')
+
+def normalize(name):
+    return " ".join(WORD.findall(name.lower()))
+
+def trigrams(normalized_name):
+    grams = set()
+    for word in normalized_name.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class TrigramTable:
+    """
+    The index itself: distinct normalized names, the product ids carrying each name, and a posting
+    list per trigram. Name ids only grow, so every posting list is sorted and can be bisected.
+    A name whose products are all gone stays in the postings as dead weight until the next rebuild.
+    """
+
+    def __init__(self):
+        self.name_ids = {} # normalized name -> name id
+        self.names = [] # name id -> normalized name
+        self.sizes = array('H') # name id -> number of distinct trigrams
+        self.product_ids = [] # name id -> product ids with that name, in the order they were added
+        self.postings = {} # trigram -> array of name ids, ascending
+        self.name_of = {} # product id -> name id
+        self.dead = 0 # Names left without products
+
+    def add(self, product_id, name):
+        self.remove(product_id)
+        key = normalize(name)
+        name_id = self.name_ids.get(key)
+        if name_id is None:
+            name_id = self.name_ids[key] = len(self.names)
+            grams = trigrams(key)
+            self.names.append(key)
+            self.sizes.append(min(len(grams), 65535))
+            self.product_ids.append([])
+            for gram in grams:
+                postings = self.postings.get(gram)
+                if postings is None:
+                    self.postings[gram] = array('i', [name_id])
+                else:
+                    postings.append(name_id)
+        elif not self.product_ids[name_id]:
+            self.dead -= 1
+        self.product_ids[name_id].append(product_id)
+        self.name_of[product_id] = name_id
+
+    def remove(self, product_id):
+        name_id = self.name_of.pop(product_id, None)
+        if name_id is not None:
+            self.product_ids[name_id].remove(product_id)
+            if not self.product_ids[name_id]:
+                self.dead += 1
+
+    def search(self, text, min_coverage, limit, max_postings=None):
+        """
+        Returns up to limit (coverage, similarity, name id), best first, for names containing at least
+        min_coverage of the text's trigrams. Coverage is the share of the text's trigrams in the name;
+        similarity (Dice) also penalizes what the name has that the text doesn't.
+        An exact name is returned alone. Returns None instead when matching would read more than
+        max_postings posting entries, i.e. the text's rarest trigrams are common to many names.
+        """
+        key = normalize(text)
+        name_id = self.name_ids.get(key)
+        if name_id is not None and self.product_ids[name_id]:
+            return [(1.0, 1.0, name_id)]
+        grams = trigrams(key)
+        if not grams:
+            return []
+        lists = sorted((self.postings.get(gram, NO_POSTINGS) for gram in grams), key=len)
+        needed = max(1, math.ceil(min_coverage * len(grams)))
+        # A name with `needed` of the trigrams has at least one among the rarest len - needed + 1, so
+        # those lists are counted in full, plus any further lists the budget allows: every list counted
+        # raises how many hits a candidate needs among them. The rest are only bisected per candidate.
+        split = len(lists) - needed + 1
+        read = sum(map(len, lists[:split]))
+        if max_postings is not None and read > max_postings:
+            return None
+        budget = max_postings if max_postings is not None else 4 * read
+        while split < len(lists) and read + len(lists[split]) <= budget:
+            read += len(lists[split])
+            split += 1
+        counted, rest = lists[:split], lists[split:]
+        rest_sizes = [len(postings) for postings in rest]
+        at_least = needed - len(rest)
+        scored = []
+        for name_id, common in Counter(chain.from_iterable(counted)).items():
+            if common < at_least or not self.product_ids[name_id]:
+                continue
+            misses_left = common - at_least # Lists in rest this name may be missing from and still qualify
+            for postings, size in zip(rest, rest_sizes):
+                position = bisect.bisect_left(postings, name_id)
+                if position < size and postings[position] == name_id:
+                    common += 1
+                else:
+                    misses_left -= 1
+                    if misses_left < 0:
+                        break
+            if common >= needed:
+                scored.append((common / len(grams), 2 * common / (len(grams) + self.sizes[name_id]), name_id))
+        scored.sort(reverse=True)
+        return scored[:limit]
+
+class ProductNameIndex:
+    """
+    Thread-safe wrapper around a TrigramTable that decides when a match is good enough to use and
+    keeps the table in sync with the e-commerce server.
+    A match is confident when it covers min_coverage of the text's trigrams and is either an exact
+    name or at least min_margin more similar than the next distinct name; anything else (including
+    lookups over max_postings) should go to the server's full-text search.
+    """
+
+    def __init__(self, min_coverage=0.75, min_margin=0.05, max_postings=2000, sync_interval=5.0):
+        self.min_coverage = min_coverage
+        self.min_margin = min_margin
+        self.max_postings = max_postings # Work cap per fuzzy lookup; past it the name goes to the server
+        self.sync_interval = sync_interval # Seconds between change log polls
+        self.seq = None # Position in the server's name change log; None until a snapshot is loaded
+        self.epoch = None # The catalog epoch seq belongs to; the log starts over in a new one
+        self.synced_at = 0.0 # time.monotonic() of the last successful sync
+        self.confident = 0 # Lookups answered locally
+        self.unsure = 0 # Lookups left to the server
+        self._table = TrigramTable()
+        self._lock = threading.Lock()
+        self._sync_thread = None
+        self._stop = threading.Event()
+
+    @property
+    def loaded(self):
+        return self.seq is not None
+
+    def resolve(self, text, limit=5):
+        """Ranked [(product id, similarity)] for a free-text name; several products may share a name."""
+        with self._lock:
+            matches = self._table.search(text, self.min_coverage, limit)
+            return [(product_id, similarity) for _, similarity, name_id in matches
+                    for product_id in self._table.product_ids[name_id]][:limit]
+
+    def best_match(self, text):
+        """The product id a name confidently resolves to, or None if the server should decide."""
+        if not self.loaded:
+            return None
+        with self._lock:
+            matches = self._table.search(text, self.min_coverage, 2, self.max_postings)
+            product_id = None
+            if matches:
+                coverage, similarity, name_id = matches[0]
+                if similarity == 1.0 or len(matches) == 1 or similarity - matches[1][1] >= self.min_margin:
+                    # Lowest rowid first, as the server's tie-break, in a table loaded from a snapshot;
+                    # products a delta adds or renames into a shared name go last whatever their rowid
+                    product_id = self._table.product_ids[name_id][0]
+            if product_id is None:
+                self.unsure += 1
+            else:
+                self.confident += 1
+            return product_id
+
+    def apply(self, data):
+        """Applies a GET /catalog/names response: a snapshot replaces the table, anything else is a delta."""
+        if data.get('snapshot'):
+            table = TrigramTable() # Built outside the lock; lookups keep using the old table meanwhile
+            for product_id, name in data['names']:
+                table.add(product_id, name)
+            with self._lock:
+                self._table = table
+        else:
+            with self._lock:
+                for product_id in data['deleted']:
+                    self._table.remove(product_id)
+                for product_id, name in data['names']:
+                    self._table.add(product_id, name)
+        self.seq = data['seq']
+        self.epoch = data.get('epoch')
+        self.synced_at = time.monotonic()
+
+    def sync(self, fetch):
+        """
+        One sync round. fetch(since, epoch) calls GET /catalog/names (since None asks for a snapshot;
+        the server also sends one when epoch isn't the catalog's) and returns the parsed response.
+        Returns False if it failed.
+        """
+        # Start over once a third of the names are dead, so they stop costing lookups
+        since = None if self._table.dead * 3 > len(self._table.names) else self.seq
+        data = fetch(since, self.epoch)
+        if not isinstance(data, dict) or data.get('error') or 'seq' not in data:
+            return False
+        self.apply(data)
+        return True
+
+    def start_sync(self, fetch):
+        """Loads the index in a background thread and polls for changes every sync_interval seconds."""
+        with self._lock:
+            if self._sync_thread is not None:
+                return
+            self._sync_thread = threading.Thread(target=self._sync_forever, args=(fetch,), name="name-index-sync", daemon=True)
+        self._sync_thread.start()
+
+    def _sync_forever(self, fetch):
+        self.sync(fetch)
+        while not self._stop.wait(self.sync_interval):
+            self.sync(fetch)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.confident + self.unsure
+            return {
+                "loaded": self.loaded,
+                "seq": self.seq,
+                "epoch": self.epoch,
+                "names": len(self._table.names) - self._table.dead,
+                "products": len(self._table.name_of),
+                "confident": self.confident,
+                "unsure": self.unsure,
+                "confident_rate": self.confident / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,95 @@
+# chatbot_logic/product_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+class ProductCache:
+    """
+    Bounded LRU cache of product dicts, keyed by product id, plus a lookup from a normalized
+    product name (as the user typed it) to the id it resolved to.
+
+    Every entry belongs to one catalog version. The e-commerce server bumps that version on every
+    product or stock change and reports it in the X-Catalog-Version header; when observe_version()
+    sees a new one the whole cache is dropped, so cached stock is never older than the last response.
+    Entries also expire after ttl seconds regardless.
+    """
+
+    def __init__(self, max_entries=5000, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None # Catalog version the cached entries belong to
+        self.version_seen_at = 0.0 # time.monotonic() when the server last confirmed self.version
+        self._products = OrderedDict() # product id -> (product, expires_at), least recently used first
+        self._names = OrderedDict() # normalized name -> product id
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize_name(name):
+        return " ".join(name.lower().split())
+
+    def observe_version(self, version):
+        """Records the catalog version from a server response, dropping everything if it changed."""
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.invalidations += 1
+                self._products.clear()
+                self._names.clear()
+                self.version = version
+            self.version_seen_at = time.monotonic()
+
+    def get(self, product_id):
+        """Returns the cached product, or None on a miss."""
+        with self._lock:
+            entry = self._products.get(product_id)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self._products.move_to_end(product_id)
+            self.hits += 1
+            return entry[0]
+
+    def get_by_name(self, name):
+        """Returns the product a name resolved to last time, or None on a miss."""
+        with self._lock:
+            product_id = self._names.get(self.normalize_name(name))
+            if product_id is None:
+                self.misses += 1
+                return None
+        return self.get(product_id)
+
+    def put(self, product, version, name=None):
+        """
+        Caches a product, and optionally the name that resolved to it. version is self.version as
+        read before the request that fetched the product; if it has moved on since, the product may
+        already be stale and is not cached.
+        """
+        with self._lock:
+            if version is None or version != self.version:
+                return
+            self._products[product['id']] = (product, time.monotonic() + self.ttl)
+            self._products.move_to_end(product['id'])
+            if name:
+                self._names[self.normalize_name(name)] = product['id']
+                self._names.move_to_end(self.normalize_name(name))
+            while len(self._products) > self.max_entries:
+                self._products.popitem(last=False)
+            while len(self._names) > self.max_entries:
+                self._names.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._products),
+                "names": len(self._names),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,210 @@
+# chatbot_logic/session_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class SessionStore:
+    """
+    Where ChatSession keeps sessions between requests. Backends implement load/save/delete/_sweep;
+    this base class holds the shared counters and the background sweeper, which removes idle
+    sessions in small batches off the request threads.
+    """
+
+    blocking = False # True if calls do file or network I/O, so the ASGI gateway runs them off its event loop
+
+    def __init__(self, idle_ttl=1800.0, sweep_interval=60.0, sweep_batch_size=500):
+        self.idle_ttl = idle_ttl # Sessions unused for this many seconds are dropped
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self.hits = 0
+        self.misses = 0
+        self.evicted_idle = 0 # Dropped for being idle longer than idle_ttl
+        self.evicted_capacity = 0 # Dropped to stay under max_entries (in-memory store only)
+        self._stop = threading.Event()
+        self._sweeper = None
+        self._sweeper_pid = None # Process the sweeper runs in; a forked child starts its own
+        self._start_lock = threading.Lock()
+
+    def load(self, session_id):
+        """Returns the stored ChatSession, or None if it doesn't exist or has expired."""
+        raise NotImplementedError
+
+    def save(self, session):
+        """Stores the session and marks it as just used."""
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def _sweep(self, now):
+        """Removes up to sweep_batch_size sessions idle since before now - idle_ttl. Returns how many."""
+        raise NotImplementedError
+
+    def sweep(self):
+        """Removes every expired session, one batch at a time so request threads only wait for a batch."""
+        now = time.time()
+        while not self._stop.is_set():
+            removed = self._sweep(now)
+            self.evicted_idle += removed
+            if removed < self.sweep_batch_size:
+                break
+
+    def start_sweeper(self):
+        """Runs sweep() every sweep_interval seconds on a daemon thread, one per process. Cheap once started."""
+        if self._sweeper_pid == os.getpid():
+            return self
+        with self._start_lock:
+            if self._sweeper_pid != os.getpid():
+                self._sweeper = threading.Thread(target=self._run_sweeper, name="session-sweeper", daemon=True)
+                self._sweeper.start()
+                self._sweeper_pid = os.getpid()
+        return self
+
+    def _run_sweeper(self):
+        while not self._stop.wait(self.sweep_interval):
+            self.sweep()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "sessions": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evicted_idle": self.evicted_idle,
+            "evicted_capacity": self.evicted_capacity,
+        }
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store: at most max_entries sessions, each dropped after idle_ttl seconds unused."""
+
+    def __init__(self, max_entries=10000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        self._sessions = OrderedDict() # session_id -> (session, last_used), least recently used first
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            session, last_used = entry
+            now = time.time()
+            if now - last_used > self.idle_ttl:
+                del self._sessions[session_id]
+                self.evicted_idle += 1
+                self.misses += 1
+                return None
+            self._sessions[session_id] = (session, now)
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+    def save(self, session):
+        with self._lock:
+            self._sessions[session.session_id] = (session, time.time())
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+                self.evicted_capacity += 1
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _sweep(self, now):
+        # Entries are in last-used order, so the expired ones are all at the front
+        cutoff = now - self.idle_ttl
+        removed = 0
+        with self._lock:
+            while removed < self.sweep_batch_size and self._sessions:
+                session_id, (_, last_used) = next(iter(self._sessions.items()))
+                if last_used >= cutoff:
+                    break
+                del self._sessions[session_id]
+                removed += 1
+        return removed
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions serialized to a SQLite file, so several gateway worker processes can share them.
+    Each thread gets its own connection; WAL lets readers and the single writer overlap.
+    """
+    blocking = True
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        db = self._connect()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_used ON chat_sessions (last_used)")
+        db.commit()
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid(): # A forked child's threads open their own
+            db = self._local.db = sqlite3.connect(self.path, timeout=5)
+            self._local.pid = os.getpid()
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+        return db
+
+    def load(self, session_id):
+        from chat_session import ChatSession # Imported here; chat_session imports this module
+
+        db = self._connect()
+        row = db.execute("SELECT data, last_used FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or time.time() - row[1] > self.idle_ttl:
+            self.misses += 1
+            return None # An expired row is left for the sweeper
+        with db:
+            db.execute("UPDATE chat_sessions SET last_used = ? WHERE session_id = ?", (time.time(), session_id))
+        self.hits += 1
+        return ChatSession.from_dict(json.loads(row[0]))
+
+    def save(self, session):
+        db = self._connect()
+        with db:
+            db.execute("INSERT OR REPLACE INTO chat_sessions (session_id, data, last_used) VALUES (?, ?, ?)",
+                       (session.session_id, json.dumps(session.to_dict()), time.time()))
+
+    def delete(self, session_id):
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+    def _sweep(self, now):
+        db = self._connect()
+        with db:
+            cursor = db.execute("""
+                DELETE FROM chat_sessions WHERE rowid IN (
+                    SELECT rowid FROM chat_sessions WHERE last_used < ? LIMIT ?
+                )
+            """, (now - self.idle_ttl, self.sweep_batch_size))
+        return cursor.rowcount
@@ -0,0 +1,113 @@
+# chatbot_logic/tracing.py
+#
+# Per-turn tracing for the gateway: a tree of timed spans (session load, intent recognition, each
+# e-commerce call, log writes, session save) under one trace id, which is also sent to the
+# e-commerce server as X-Trace-ID. Only turns that are sampled or ask for their timing tree are
+# traced; for every other turn span() returns a shared no-op.
+#
+# Environment: CHATBOT_TRACE_SAMPLE_RATE (fraction of turns written out, default 0: nothing is
+# written unless sampling is turned on) and CHATBOT_TRACE_FILE (JSON lines, default
+# chatbot_traces.jsonl). The file isn't rotated, so a sample rate is for a bounded investigation.
+
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+
+SAMPLE_RATE = float(os.environ.get('CHATBOT_TRACE_SAMPLE_RATE', '0'))
+TRACE_FILE = os.environ.get('CHATBOT_TRACE_FILE', 'chatbot_traces.jsonl')
+
+_current = contextvars.ContextVar('current_span', default=None) # Per thread, and per task in the async gateway
+_file_lock = threading.Lock()
+_file = None # Opened on the first sampled trace
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'attrs', 'start', 'duration', 'children', '_token')
+
+    def __init__(self, name, trace_id, attrs):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.children = []
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        _current.reset(self._token)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, origin):
+        """The span and its children, with times in ms relative to origin (the root's start)."""
+        node = {"name": self.name, "start_ms": round((self.start - origin) * 1000, 3),
+                "ms": round(self.duration * 1000, 3) if self.duration is not None else None}
+        node.update(self.attrs)
+        if self.children:
+            node["children"] = [child.to_dict(origin) for child in self.children]
+        return node
+
+class NoSpan:
+    """Stands in for every span of a turn that isn't traced."""
+    trace_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+NO_SPAN = NoSpan()
+
+def start_trace(name, trace_id=None, debug=False):
+    """
+    The root span for a turn: traced when debug asks for the timing tree or the turn is sampled,
+    otherwise NO_SPAN. trace_id is reused when the caller sent one.
+    """
+    sampled = SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+    if not (debug or sampled):
+        return NO_SPAN
+    root = Span(name, trace_id or os.urandom(8).hex(), {})
+    root.set(trace_id=root.trace_id, sampled=sampled)
+    return root
+
+def span(name, **attrs):
+    """A child of the current span, used as a context manager; NO_SPAN when the turn isn't traced."""
+    parent = _current.get()
+    if parent is None:
+        return NO_SPAN
+    child = Span(name, parent.trace_id, attrs)
+    parent.children.append(child)
+    return child
+
+def finish_trace(root):
+    """Returns the finished root's timing tree (None if untraced), writing it to TRACE_FILE if it was sampled."""
+    if root is NO_SPAN:
+        return None
+    tree = root.to_dict(root.start)
+    if root.attrs['sampled']:
+        _write(tree)
+    return tree
+
+def _write(tree):
+    global _file
+    line = json.dumps(tree) + "\n"
+    with _file_lock:
+        try:
+            if _file is None:
+                _file = open(TRACE_FILE, 'a', buffering=1) # Line buffered: each trace lands whole
+            _file.write(line)
+        except OSError as e:
+            print(f"Error writing trace to {TRACE_FILE}: {e}")